@@ -0,0 +1,95 @@
+# scripts/backfill.py
+from __future__ import annotations
+import pandas as pd
+from typing import Any, Dict, Iterable
+from utils.io_utils import DEFAULT_BATCH_DAYS, ensure_dirs, read_config, get_storage
+from scripts.process_barakah import _prepare, save_feature_watermark
+from scripts.calculate_barakah import score_frame
+
+# Out-of-core rebuild of daily_features / barakah_scores / outcomes for
+# histories too large to hold in memory (bulk multi-user backfills). Logs are
+# streamed in batches of whole days; each batch goes through the same feature
+# and scoring code as compute_scores() and is appended to the tables, so the
+# result is the same as the in-memory path.
+#
+# config.json -> "pipeline": {"batch_days": N, "memory_mb": M}. batch_days caps
+# a batch; after each batch its size is re-derived from the measured bytes per
+# day so that one batch's frames stay within memory_mb.
+
+DEFAULT_MEMORY_MB = 256
+
+# First batch size, before there is a bytes-per-day measurement to size from
+PROBE_DAYS = 64
+
+# Headroom: size batches to this fraction of the budget
+BUDGET_FILL = 0.8
+
+
+def _frames_nbytes(frames: Iterable[pd.DataFrame]) -> int:
+    return int(sum(f.memory_usage(index=True, deep=True).sum() for f in frames))
+
+
+def build_chunked(user: str | None = None, batch_days: int | None = None,
+                  memory_mb: float | None = None) -> Dict[str, Any]:
+    """
+    Rebuild the processed tables for the full history, one batch of days at a time.
+
+    Args:
+        user: Whose shard to rebuild, or None for the single-user layout
+        batch_days: Most days per batch (default: pipeline.batch_days)
+        memory_mb: Budget for one batch's frames (default: pipeline.memory_mb)
+
+    Returns:
+        dict: days, batches, peak_bytes (largest batch working set),
+        over_budget (batches that exceeded the budget) and budget_bytes
+
+    Raises:
+        MemoryError: A single day needs more than the budget
+    """
+    ensure_dirs(user)
+    cfg = read_config(user)
+    p_cfg = cfg.get("pipeline", {})
+    max_days = int(batch_days or p_cfg.get("batch_days", DEFAULT_BATCH_DAYS))
+    budget = int(float(memory_mb or p_cfg.get("memory_mb", DEFAULT_MEMORY_MB)) * 2**20)
+    storage = get_storage(cfg, user)
+    stats = {"days": 0, "batches": 0, "peak_bytes": 0, "over_budget": 0, "budget_bytes": budget}
+
+    # Taken before reading, so saves made during the rebuild are picked up incrementally
+    token = storage.changes_since(None)[1]
+    batches = storage.iter_logs(batch_days=min(max_days, PROBE_DAYS))
+    with storage.table_writer("daily_features") as write_features, \
+            storage.table_writer("barakah_scores") as write_scores, \
+            storage.table_writer("outcomes") as write_outcomes:
+        logs = next(batches, None)
+        while logs is not None:
+            days = len(logs)
+            dates = logs["date"]
+            feat = _prepare(storage, cfg, logs, str(dates.iloc[0]), str(dates.iloc[-1]))
+            scores = score_frame(feat, cfg)
+            used = _frames_nbytes([logs, feat, scores])
+            if used > budget:
+                if days == 1:
+                    raise MemoryError(f"One day of logs needs {used} bytes, over the {budget}-byte budget")
+                stats["over_budget"] += 1
+
+            write_features(feat)
+            write_scores(scores)
+            write_outcomes(scores[["date", "clarity", "focus", "calm", "productivity"]])
+            stats["days"] += days
+            stats["batches"] += 1
+            stats["peak_bytes"] = max(stats["peak_bytes"], used)
+
+            # Next batch sized from what this one cost per day
+            size = max(1, min(max_days, int(budget * BUDGET_FILL * days / used)))
+            del logs, feat, scores
+            try:
+                logs = batches.send(size)
+            except StopIteration:
+                logs = None
+    if stats["days"]:
+        save_feature_watermark(user, cfg, token)
+    return stats
+
+
+if __name__ == "__main__":
+    print(build_chunked())
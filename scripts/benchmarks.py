@@ -0,0 +1,1031 @@
+# scripts/benchmarks.py
+from __future__ import annotations
+import os
+import sys
+import random
+import tempfile
+import time
+import numpy as np
+from utils.io_utils import append_daily_log, _jsonl_line
+
+
+def synthetic_entry(i: int) -> dict:
+    """
+    Build a realistic daily log entry for benchmarking.
+
+    Args:
+        i: Day offset used to derive the date and vary the values
+
+    Returns:
+        dict: Entry shaped like the ones written by the Log Day page
+    """
+    rng = random.Random(i)
+    day = np.datetime64("2000-01-01") + np.timedelta64(i, "D")
+    return {
+        "date": str(day),
+        "Fajr": rng.random() < 0.8, "Dhuhr": rng.random() < 0.8, "Asr": rng.random() < 0.8,
+        "Maghrib": rng.random() < 0.9, "Isha": rng.random() < 0.85,
+        "quran_recs": [{"surah": "Al-Kahf", "ayahs": rng.randint(0, 20)}],
+        "dhikr_reps": rng.randint(0, 500),
+        "sadaqah_amount": round(rng.random() * 20, 2),
+        "sleep_hours": round(rng.uniform(5, 9), 2),
+        "bedtime": f"{rng.randint(21, 23)}:{rng.randint(0, 59):02d}",
+        "app_minutes": {"Quran": rng.randint(0, 60), "Instagram": rng.randint(0, 120),
+                        "YouTube": rng.randint(0, 90)},
+        "other_good": rng.randint(0, 3),
+        "other_bad": rng.randint(0, 2),
+        "clarity": rng.randint(1, 5), "focus": rng.randint(1, 5),
+        "calm": rng.randint(1, 5), "productivity": rng.randint(1, 5),
+    }
+
+
+def _percentile_ms(samples: list[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000.0)
+
+
+def bench_journal_append(sizes=(100, 10_000, 100_000, 1_000_000), samples: int = 200,
+                         fsync_every: int = 0) -> list[dict]:
+    """
+    Measure "Save Day" latency as the history grows, journal vs legacy JSON array.
+
+    Args:
+        sizes: History sizes (entries already on disk) to measure at
+        samples: Appends timed at each size
+        fsync_every: Journal fsync batching passed through to the writer
+
+    Returns:
+        list: One row per (mode, size) with median and p99 latency in ms
+    """
+    import utils.io_utils as io
+    io.JOURNAL_FSYNC_EVERY = fsync_every
+    rows = []
+    with tempfile.TemporaryDirectory() as d:
+        journal = os.path.join(d, "daily_logs.jsonl")
+        written = 0
+        for n in sizes:
+            # Grow the journal to n entries in bulk, then time single saves
+            with open(journal, "a", encoding="utf-8") as f:
+                f.writelines(_jsonl_line(synthetic_entry(i)) for i in range(written, n))
+            written = n
+            times = []
+            for i in range(samples):
+                entry = synthetic_entry(written + i)
+                t0 = time.perf_counter()
+                append_daily_log(entry, journal)
+                times.append(time.perf_counter() - t0)
+            written += samples
+            rows.append({"mode": "journal", "entries": n,
+                         "median_ms": _percentile_ms(times, 50), "p99_ms": _percentile_ms(times, 99)})
+
+        # The legacy array is O(n) per save, so only the small sizes are practical
+        legacy = os.path.join(d, "daily_logs.json")
+        for n in [s for s in sizes if s <= 10_000]:
+            io.save_json(legacy, [synthetic_entry(i) for i in range(n)])
+            times = []
+            for i in range(min(samples, 20)):
+                t0 = time.perf_counter()
+                append_daily_log(synthetic_entry(n + i), legacy)
+                times.append(time.perf_counter() - t0)
+            rows.append({"mode": "legacy_json", "entries": n,
+                         "median_ms": _percentile_ms(times, 50), "p99_ms": _percentile_ms(times, 99)})
+    return rows
+
+
+def bench_background_writer(sizes=(100, 10_000, 100_000, 1_000_000), samples: int = 200) -> list[dict]:
+    """
+    Measure what the Log Day form waits for when saves go through the background writer.
+
+    Args:
+        sizes: History sizes (entries already in the journal) to measure at
+        samples: Saves submitted at each size
+
+    Returns:
+        list: One row per size with submit p50/p99 and the time to drain the queue
+    """
+    import utils.io_utils as io
+    rows = []
+    old_root = io.ROOT
+    with tempfile.TemporaryDirectory() as d:
+        io.ROOT = d
+        try:
+            io.ensure_dirs()
+            storage = io.FileStorage()
+            writer = io.BackgroundLogWriter(storage)
+            written = 0
+            for n in sizes:
+                with open(io.journal_log_path(), "a", encoding="utf-8") as f:
+                    f.writelines(_jsonl_line(synthetic_entry(i)) for i in range(written, n))
+                written = n
+                io.daily_log_index().refresh()
+                times = []
+                for i in range(samples):
+                    t0 = time.perf_counter()
+                    writer.submit(synthetic_entry(written + i))
+                    times.append(time.perf_counter() - t0)
+                t0 = time.perf_counter()
+                writer.flush()
+                drain = time.perf_counter() - t0
+                written += samples
+                rows.append({"entries": n, "submit_p50_ms": _percentile_ms(times, 50),
+                             "submit_p99_ms": _percentile_ms(times, 99), "drain_ms": drain * 1000.0})
+            writer.close()
+        finally:
+            io.ROOT = old_root
+    return rows
+
+
+def bench_writer_tickets(threads: int = 8, per_thread: int = 200) -> list[dict]:
+    """
+    Stress test: threads submit to one background writer and flush as they go.
+
+    Each successful flush claims every ticket submitted before it is durable;
+    checks that all of them were in storage at that point, whichever thread
+    submitted them, and that nothing is left pending at the end.
+
+    Args:
+        threads: Concurrent submitting threads
+        per_thread: Entries each thread submits
+
+    Returns:
+        list: One row with tickets submitted, flushes checked and saves per second
+    """
+    import threading
+    import utils.io_utils as io
+    old_root = io.ROOT
+    with tempfile.TemporaryDirectory() as d:
+        io.ROOT = d
+        try:
+            io.ensure_dirs()
+            writer = io.BackgroundLogWriter(io.FileStorage())
+            days: dict = {}
+            flushes: list = []
+
+            def run(t: int):
+                for i in range(per_thread):
+                    entry = synthetic_entry(t * per_thread + i)
+                    days[writer.submit(entry)] = entry["date"]
+                    if i % 10 == 9:
+                        claimed = writer.status()["submitted"]
+                        if writer.flush(30.0):
+                            flushes.append((claimed, {e["date"] for e in io.daily_log_index().values()}))
+
+            t0 = time.perf_counter()
+            pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            if not writer.flush(30.0):
+                raise AssertionError("writer did not drain")
+            elapsed = time.perf_counter() - t0
+            writer.close()
+            missing = {t for claimed, stored in flushes for t in range(1, claimed + 1) if days[t] not in stored}
+            missing |= {t for t in days if writer.result(t) != "durable"}
+            expected = threads * per_thread
+            found = len(io.daily_log_index().values())
+            if missing or found != expected:
+                raise AssertionError(f"{len(missing)} tickets reported durable before they were stored; "
+                                     f"{found} of {expected} days saved")
+        finally:
+            io.ROOT = old_root
+    return [{"tickets": expected, "flushes": len(flushes), "saves_per_s": expected / elapsed}]
+
+
+def _stress_worker(args: tuple) -> int:
+    path, writer_id, count, threads = args
+    import threading
+    from utils.io_utils import append_daily_log
+
+    def run(t: int):
+        for i in range(t, count, threads):
+            entry = synthetic_entry(i)
+            entry["writer"], entry["seq"] = writer_id, i
+            append_daily_log(entry, path)
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return count
+
+
+def bench_concurrent_appends(processes: int = 8, per_process: int = 500, threads: int = 4) -> list[dict]:
+    """
+    Stress test: N processes (each with several threads) append to the same log file.
+
+    Checks that every entry survives, for both the journal and the legacy JSON array.
+
+    Args:
+        processes: Concurrent writer processes
+        per_process: Entries each process appends
+        threads: Writer threads inside each process
+
+    Returns:
+        list: One row per mode with entries expected/found and appends per second
+    """
+    import multiprocessing as mp
+    from utils.io_utils import iter_jsonl, load_json
+    rows = []
+    with tempfile.TemporaryDirectory() as d:
+        for mode, name, count in [("journal", "daily_logs.jsonl", per_process),
+                                  ("legacy_json", "daily_logs.json", max(1, per_process // 10))]:
+            path = os.path.join(d, name)
+            t0 = time.perf_counter()
+            with mp.get_context("spawn").Pool(processes) as pool:
+                pool.map(_stress_worker, [(path, p, count, threads) for p in range(processes)])
+            elapsed = time.perf_counter() - t0
+            entries = list(iter_jsonl(path)) if mode == "journal" else load_json(path, [])
+            found = len({(e["writer"], e["seq"]) for e in entries})
+            expected = processes * count
+            if found != expected:
+                raise AssertionError(f"{mode}: lost {expected - found} of {expected} entries")
+            rows.append({"mode": mode, "expected": expected, "found": found,
+                         "appends_per_s": expected / elapsed})
+    return rows
+
+
+def _write_synthetic_array(path: str, target_bytes: int) -> int:
+    # Stream entries into a legacy-format JSON array until it reaches target_bytes
+    import json
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        size = 2
+        while size < target_bytes:
+            text = ("" if n == 0 else ",\n") + json.dumps(synthetic_entry(n % 50_000), indent=2)
+            f.write(text)
+            size += len(text)
+            n += 1
+        f.write("\n]")
+    return n
+
+
+def _peak_rss_reader(args: tuple) -> dict:
+    import resource
+    path, mode = args
+    import json
+    from utils.io_utils import iter_json_array
+    t0 = time.perf_counter()
+    if mode == "json.load":
+        with open(path, "r", encoding="utf-8") as f:
+            n = len(json.load(f))
+    else:
+        n = sum(1 for _ in iter_json_array(path))
+    elapsed = time.perf_counter() - t0
+    # ru_maxrss is KiB on Linux
+    return {"entries": n, "seconds": elapsed,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}
+
+
+def bench_streaming_reader(target_bytes: int = 1 << 30) -> list[dict]:
+    """
+    Peak RSS of reading a large legacy daily_logs.json: json.load vs iter_json_array.
+
+    Each reader runs in a fresh process so ru_maxrss reflects only that reader.
+
+    Args:
+        target_bytes: Size of the synthetic JSON array (default 1 GB)
+
+    Returns:
+        list: One row per reader with entries, seconds and peak RSS in MB
+    """
+    import multiprocessing as mp
+    rows = []
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "daily_logs.json")
+        _write_synthetic_array(path, target_bytes)
+        file_mb = os.path.getsize(path) / 1e6
+        ctx = mp.get_context("spawn")
+        for mode in ("json.load", "iter_json_array"):
+            with ctx.Pool(1) as pool:
+                res = pool.map(_peak_rss_reader, [(path, mode)])[0]
+            rows.append({"reader": mode, "file_mb": file_mb, **res})
+    return rows
+
+
+def bench_cold_archive(days: int = 3650) -> list[dict]:
+    """
+    Compression ratio and cold-read throughput of gzip-archived monthly segments.
+
+    Args:
+        days: Days of history to generate (split into monthly segments)
+
+    Returns:
+        list: One row per layout (plain vs gzip) with bytes on disk and read rate
+    """
+    import datetime
+    import utils.io_utils as io
+    from utils.segments import segment_store
+    rows = []
+    old_root = io.ROOT
+    with tempfile.TemporaryDirectory() as d:
+        io.ROOT = d
+        try:
+            io.ensure_dirs()
+            store = segment_store()
+            store.upsert([synthetic_entry(i) for i in range(days)])
+
+            def disk_bytes() -> int:
+                return sum(os.path.getsize(os.path.join(store.directory, f))
+                           for f in os.listdir(store.directory) if f.endswith((".jsonl", ".gz")))
+
+            def cold_read() -> float:
+                # Drop in-memory indexes and cached frames so every segment is re-read
+                io._log_indexes.clear()
+                io.FILE_CACHE.clear()
+                t0 = time.perf_counter()
+                n = len(io.daily_logs_df())
+                return n / (time.perf_counter() - t0)
+
+            plain = disk_bytes()
+            rows.append({"layout": "plain", "bytes": plain, "ratio": 1.0, "days_per_s": cold_read()})
+            end = datetime.date(2000, 1, 1) + datetime.timedelta(days=days)
+            store.archive(0, today=end + datetime.timedelta(days=40))
+            packed = disk_bytes()
+            rows.append({"layout": "gzip", "bytes": packed, "ratio": plain / packed, "days_per_s": cold_read()})
+        finally:
+            io.ROOT = old_root
+    return rows
+
+
+def bench_codecs(entries: int = 20_000, repeat: int = 3) -> list[dict]:
+    """
+    Encode/decode throughput of the serialization codecs on synthetic log entries.
+
+    Args:
+        entries: Entries per round
+        repeat: Rounds per codec (best round is reported)
+
+    Returns:
+        list: One row per codec with bytes per entry and encode/decode MB/s
+    """
+    import json
+    from utils.io_utils import COMPACT_JSON, PRETTY_JSON, orjson
+    data = [synthetic_entry(i) for i in range(entries)]
+
+    def stdlib_pretty():
+        blob = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        return blob, lambda: json.loads(blob)
+
+    def codec_array(codec):
+        def run():
+            blob = codec.encode(data)
+            return blob, lambda: codec.decode(blob)
+        return run
+
+    backend = "orjson" if orjson is not None else "stdlib"
+    cases = [("stdlib indent=2 (old save_json)", stdlib_pretty),
+             (f"pretty ({backend})", codec_array(PRETTY_JSON)),
+             (f"compact ({backend})", codec_array(COMPACT_JSON))]
+    rows = []
+    for name, make in cases:
+        best_enc = best_dec = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            blob, decode = make()
+            best_enc = min(best_enc, time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            decode()
+            best_dec = min(best_dec, time.perf_counter() - t0)
+        mb = len(blob) / 1e6
+        rows.append({"codec": name, "bytes_per_entry": len(blob) / entries,
+                     "encode_mb_s": mb / best_enc, "decode_mb_s": mb / best_dec,
+                     "encode_entries_s": entries / best_enc, "decode_entries_s": entries / best_dec})
+    return rows
+
+
+def _dict_usage_bytes(usage) -> int:
+    # Rough size of {name: minutes} dicts including their key/value objects
+    return sum(sys.getsizeof(m) + sum(sys.getsizeof(a) + sys.getsizeof(v) for a, v in m.items())
+               for m in usage if isinstance(m, dict))
+
+
+def bench_app_encoding(entries: int = 100_000) -> list[dict]:
+    """
+    Screen-time storage before/after dictionary encoding of app names.
+
+    Args:
+        entries: Days of synthetic history
+
+    Returns:
+        list: One row per layout with bytes per entry on disk, parse time,
+        in-memory size of the app usage and productive/distracting split time
+    """
+    import json
+    import pandas as pd
+    import utils.io_utils as io
+    from utils.app_dict import app_dictionary, encode_app_usage
+    from utils.child_tables import app_usage_table, sum_by_date
+    prod, dist = ["Quran"], ["Instagram", "YouTube"]
+
+    def split_rowwise(logs):
+        # The old per-row split in build_features
+        def split(m):
+            p = sum(float(v) for a, v in m.items() if a in set(prod))
+            d = sum(float(v) for a, v in m.items() if a in set(dist))
+            return pd.Series({"prod_minutes": p, "dist_minutes": d})
+        return logs["app_minutes"].apply(split)
+
+    def split_ids(logs):
+        # As build_features does it: one app_usage child table, summed per day by id
+        index = app_dictionary().snapshot()[1]
+        usage = app_usage_table(logs, index)
+        days = pd.Index(logs["date"].to_numpy())
+        app_ids = usage["app_id"].to_numpy()
+        return [sum_by_date(usage, "minutes", days, where=np.isin(app_ids, [index[a] for a in apps]))
+                for apps in (prod, dist)] + [usage]
+
+    old_root = io.ROOT
+    rows = []
+    with tempfile.TemporaryDirectory() as d:
+        io.ROOT = d
+        io.ensure_dirs()
+        try:
+            raw = [synthetic_entry(i) for i in range(entries)]
+            for name, data in (("app-name dicts", raw), ("dictionary ids", encode_app_usage(raw))):
+                blob = "".join(_jsonl_line(e) for e in data)
+                t0 = time.perf_counter()
+                logs = pd.DataFrame([json.loads(line) for line in blob.splitlines()])
+                parse_s = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                if "app_minutes" in logs:
+                    split_rowwise(logs)
+                    mem = _dict_usage_bytes(logs["app_minutes"])
+                else:
+                    usage = split_ids(logs)[2]
+                    mem = int(usage.memory_usage(deep=True).sum())
+                split_s = time.perf_counter() - t0
+                rows.append({"layout": name, "bytes_per_entry": len(blob.encode("utf-8")) / entries,
+                             "parse_s": parse_s, "usage_mb": mem / 1e6, "split_s": split_s})
+        finally:
+            io.ROOT = old_root
+    return rows
+
+
+def _rowwise_features(logs, cfg: dict):
+    # build_features as it was before vectorisation, kept as the reference
+    import pandas as pd
+    logs = logs.copy()
+    logs["date"] = pd.to_datetime(logs["date"]).dt.date.astype(str)
+    for c in ["Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"]:
+        logs[c] = logs[c].fillna(0).astype(int)
+    feat = pd.DataFrame()
+    feat["date"] = logs["date"]
+    feat["prayer_on_time"] = logs[["Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"]].mean(axis=1)
+    feat["quran_items"] = logs["quran_recs"].apply(
+        lambda xs: sum(int(x.get("ayahs", 0)) for x in xs if isinstance(xs, list))
+    )
+    feat["dhikr_reps"] = logs["dhikr_reps"].fillna(0).astype(int)
+    feat["sadaqah_amount"] = logs["sadaqah_amount"].fillna(0.0).astype(float)
+    feat["sleep_hours"] = logs["sleep_hours"].fillna(0.0).astype(float)
+    feat["bedtime"] = logs["bedtime"].fillna("")
+    feat["other_good"] = logs["other_good"].fillna(0).astype(int)
+    feat["other_bad"] = logs["other_bad"].fillna(0).astype(int)
+
+    def split_minutes(m):
+        prod = 0.0
+        dist = 0.0
+        prod_list = set(cfg.get("screen_time", {}).get("productive_apps", []))
+        dist_list = set(cfg.get("screen_time", {}).get("distracting_apps", []))
+        for a, mins in (m or {}).items():
+            if a in prod_list:
+                prod += float(mins)
+            if a in dist_list:
+                dist += float(mins)
+        return pd.Series({"prod_minutes": prod, "dist_minutes": dist})
+
+    feat = pd.concat([feat, logs["app_minutes"].apply(split_minutes)], axis=1)
+    for k in ["clarity", "focus", "calm", "productivity"]:
+        feat[k] = pd.to_numeric(logs[k], errors="coerce").astype("float64")
+    return feat.reset_index(drop=True)
+
+
+def bench_features(sizes=(1_000, 100_000, 1_000_000), reference_max: int = 100_000) -> list[dict]:
+    """
+    Vectorised feature builder vs the old row-wise one, with an equivalence check.
+
+    Args:
+        sizes: Days of history to build features for
+        reference_max: Largest size the (slow) row-wise reference is run at
+
+    Returns:
+        list: One row per size with both timings and whether outputs were identical
+    """
+    import pandas as pd
+    import utils.io_utils as io
+    from utils.app_dict import app_dictionary, encode_app_usage
+    from scripts.process_barakah import features_from_logs
+    cfg = io.read_config() or {"screen_time": {"productive_apps": ["Quran"],
+                                               "distracting_apps": ["Instagram", "YouTube"]}}
+    old_root = io.ROOT
+    rows = []
+    with tempfile.TemporaryDirectory() as d:
+        io.ROOT = d
+        io.ensure_dirs()
+        try:
+            for n in sizes:
+                raw = []
+                for i in range(n):
+                    e = synthetic_entry(i)
+                    # Start early enough for the reference's pandas timestamps at 100k days
+                    e["date"] = str(np.datetime64("1700-01-01") + np.timedelta64(i, "D"))
+                    # Vary the nesting: no/several recitations, fractional minutes
+                    e["quran_recs"] = e["quran_recs"] * (i % 3)
+                    e["app_minutes"] = {a: m + (i % 7) * 0.01 for a, m in e["app_minutes"].items()}
+                    raw.append(e)
+                stored = pd.DataFrame.from_records(encode_app_usage(raw))
+                t0 = time.perf_counter()
+                feat = features_from_logs(stored, cfg, app_dictionary().snapshot()[0])
+                vec_s = time.perf_counter() - t0
+                row = {"days": n, "vectorized_s": vec_s, "rowwise_s": float("nan"), "identical": "-"}
+                if n <= reference_max:
+                    legacy = pd.DataFrame.from_records(raw)
+                    t0 = time.perf_counter()
+                    ref = _rowwise_features(legacy, cfg)
+                    row["rowwise_s"] = time.perf_counter() - t0
+                    pd.testing.assert_frame_equal(feat, ref)
+                    row["identical"] = "yes"
+                rows.append(row)
+        finally:
+            io.ROOT = old_root
+    return rows
+
+
+def bench_incremental_features(sizes=(1_000, 10_000, 100_000)) -> list[dict]:
+    """
+    Cost of build_features after saving one day: watermark merge vs full rebuild.
+
+    Also checks that a chunked rebuild (build_chunked, which leaves only the CSV)
+    followed by an incremental build gives the same features as a full build.
+
+    Args:
+        sizes: Days of history already stored
+
+    Returns:
+        list: One row per size with full-build and incremental timings
+    """
+    import json
+    import pandas as pd
+    import utils.io_utils as io
+    from scripts.backfill import build_chunked
+    from scripts.process_barakah import build_features, reset_feature_watermark
+    with open(os.path.join(os.path.dirname(__file__), "..", "config", "config.json"), encoding="utf-8") as f:
+        cfg = json.load(f)
+    old_root = io.ROOT
+    rows = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as d:
+            io.ROOT = d
+            io.ensure_dirs()
+            try:
+                io.write_config(cfg)
+                storage = io.get_storage(cfg)
+                entries = [synthetic_entry(i) for i in range(n)]
+                for e in entries[::3]:
+                    e["bedtime"] = ""  # optional on the Log Day form
+                storage.upsert_logs(entries)
+                t0 = time.perf_counter()
+                build_features()
+                full_s = time.perf_counter() - t0
+                storage.upsert_logs([synthetic_entry(n)])
+                t0 = time.perf_counter()
+                build_features()
+                inc_s = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                build_features()
+                unchanged_s = time.perf_counter() - t0
+                reset_feature_watermark()
+                t0 = time.perf_counter()
+                build_features()
+                rebuild_s = time.perf_counter() - t0
+                build_chunked()
+                io.FILE_CACHE.clear()
+                storage.upsert_logs([synthetic_entry(n + 1)])
+                incremental = build_features()
+                reset_feature_watermark()
+                pd.testing.assert_frame_equal(incremental, build_features())
+            finally:
+                io.ROOT = old_root
+        rows.append({"days": n, "first_build_s": full_s, "one_new_day_s": inc_s,
+                     "no_change_s": unchanged_s, "full_rebuild_s": rebuild_s})
+    return rows
+
+
+def _write_pipeline_logs(args: tuple) -> int:
+    import utils.io_utils as io
+    root, cfg, n = args
+    io.ROOT = root
+    io.ensure_dirs()
+    io.write_config(cfg)
+    io.get_storage(cfg).upsert_logs([synthetic_entry(i) for i in range(n)])
+    return n
+
+
+def _peak_rss_pipeline(args: tuple) -> dict:
+    import resource
+    import utils.io_utils as io
+    root, mode = args
+    io.ROOT = root
+    t0 = time.perf_counter()
+    if mode == "in-memory":
+        from scripts.calculate_barakah import compute_scores
+        n = len(compute_scores())
+    else:
+        from scripts.backfill import build_chunked
+        n = build_chunked()["days"]
+    elapsed = time.perf_counter() - t0
+    return {"days": n, "seconds": elapsed,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}
+
+
+def bench_chunked_pipeline(sizes=(10_000, 200_000)) -> list[dict]:
+    """
+    Peak RSS and time of rebuilding features and scores: compute_scores vs build_chunked.
+
+    The logs are written and each pipeline run in its own fresh process (ru_maxrss
+    survives fork/exec, so the parent stays small); default pipeline config.
+
+    Args:
+        sizes: Days of history
+
+    Returns:
+        list: One row per size and mode with seconds and peak RSS in MB
+    """
+    import json
+    import multiprocessing as mp
+    with open(os.path.join(os.path.dirname(__file__), "..", "config", "config.json"), encoding="utf-8") as f:
+        cfg = json.load(f)
+    ctx = mp.get_context("spawn")
+    rows = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as d:
+            with ctx.Pool(1) as pool:
+                pool.map(_write_pipeline_logs, [(d, cfg, n)])
+            for mode in ("in-memory", "chunked"):
+                with ctx.Pool(1) as pool:
+                    res = pool.map(_peak_rss_pipeline, [(d, mode)])[0]
+                rows.append({"mode": mode, **res})
+    return rows
+
+
+def bench_stage_cache(sizes=(1_000, 10_000), renders: int = 5) -> list[dict]:
+    """
+    Time of one Insights + Data render (scores and model) with and without the stage cache.
+
+    Args:
+        sizes: Days of history
+        renders: Renders timed per mode
+
+    Returns:
+        list: One row per size: direct calls vs a cold and a warm run_stage
+    """
+    import json
+    import utils.io_utils as io
+    from scripts.calculate_barakah import compute_scores
+    from scripts.barakah_model import train_and_analyze
+    from scripts.pipeline import run_stage
+    with open(os.path.join(os.path.dirname(__file__), "..", "config", "config.json"), encoding="utf-8") as f:
+        cfg = json.load(f)
+    old_root = io.ROOT
+    rows = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as d:
+            io.ROOT = d
+            try:
+                io.ensure_dirs()
+                io.write_config(cfg)
+                io.get_storage(cfg).upsert_logs([synthetic_entry(i) for i in range(n)])
+                t0 = time.perf_counter()
+                for _ in range(renders):
+                    train_and_analyze()
+                    compute_scores()
+                direct_s = (time.perf_counter() - t0) / renders
+                t0 = time.perf_counter()
+                run_stage("model")
+                run_stage("scores")
+                cold_s = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                for _ in range(renders):
+                    run_stage("model")
+                    run_stage("scores")
+                warm_s = (time.perf_counter() - t0) / renders
+            finally:
+                io.ROOT = old_root
+        rows.append({"days": n, "direct_s": direct_s, "cold_cache_s": cold_s, "warm_cache_s": warm_s})
+    return rows
+
+
+def bench_insights_handoff(sizes=(1_000, 10_000, 30_000), renders: int = 3) -> list[dict]:
+    """
+    Insights pipeline after one new day: tables written and re-read vs frames handed over.
+
+    "before" is compute_scores() then train_and_analyze() reading daily_features
+    back from disk; "after" builds features once and passes the frame to both
+    without persisting. fit_s (the random forest itself, same in both) is timed
+    separately, so the rest is the pipeline's own cost.
+
+    Args:
+        sizes: Days of history
+        renders: Renders timed per mode (each after saving one more day)
+
+    Returns:
+        list: One row per size with mean seconds per render
+    """
+    import json
+    import utils.io_utils as io
+    import scripts.barakah_model as bm
+    from scripts.process_barakah import build_features
+    from scripts.calculate_barakah import compute_scores
+    with open(os.path.join(os.path.dirname(__file__), "..", "config", "config.json"), encoding="utf-8") as f:
+        cfg = json.load(f)
+    fit = {"s": 0.0}
+    train_model = bm.train_model
+
+    def timed_train_model(X, y):
+        t0 = time.perf_counter()
+        try:
+            return train_model(X, y)
+        finally:
+            fit["s"] += time.perf_counter() - t0
+
+    old_root = io.ROOT
+    bm.train_model = timed_train_model
+    rows = []
+    try:
+        for n in sizes:
+            with tempfile.TemporaryDirectory() as d:
+                io.ROOT = d
+                io.ensure_dirs()
+                io.write_config(cfg)
+                storage = io.get_storage(cfg)
+                storage.upsert_logs([synthetic_entry(i) for i in range(n)])
+                compute_scores()
+                row = {"days": n}
+                day = n
+                for mode in ("before", "after"):
+                    fit["s"] = 0.0
+                    total = 0.0
+                    for _ in range(renders):
+                        storage.upsert_logs([synthetic_entry(day)])
+                        day += 1
+                        t0 = time.perf_counter()
+                        if mode == "before":
+                            compute_scores()
+                            bm.train_and_analyze()
+                        else:
+                            feat = build_features()
+                            compute_scores(features=feat, persist=False)
+                            bm.train_and_analyze(features=feat, persist=False)
+                        total += time.perf_counter() - t0
+                    row[f"{mode}_s"] = total / renders
+                    row[f"{mode}_no_fit_s"] = (total - fit["s"]) / renders
+                rows.append(row)
+    finally:
+        bm.train_model = train_model
+        io.ROOT = old_root
+    return rows
+
+
+def bench_pure_scoring(sizes=(7, 30, 365), seconds: float = 2.0) -> list[dict]:
+    """
+    Calls per second of the disk-free scores_from_logs() on a few days of logs.
+
+    score_only is score_frame() on features built once (what-if runs that only
+    vary weights/scales); wrapper_ms is one compute_scores() over the same days
+    through the store, for comparison.
+
+    Args:
+        sizes: Days of logs per call
+        seconds: Time spent calling each function per size
+
+    Returns:
+        list: One row per size
+    """
+    import json
+    import utils.io_utils as io
+    from utils.app_dict import app_dictionary
+    from scripts.process_barakah import features_from_logs
+    from scripts.calculate_barakah import compute_scores, score_frame, scores_from_logs
+    with open(os.path.join(os.path.dirname(__file__), "..", "config", "config.json"), encoding="utf-8") as f:
+        cfg = json.load(f)
+
+    def rate(fn) -> float:
+        calls, t0 = 0, time.perf_counter()
+        while time.perf_counter() - t0 < seconds:
+            fn()
+            calls += 1
+        return calls / (time.perf_counter() - t0)
+
+    old_root = io.ROOT
+    rows = []
+    try:
+        for n in sizes:
+            with tempfile.TemporaryDirectory() as d:
+                io.ROOT = d
+                io.ensure_dirs()
+                io.write_config(cfg)
+                storage = io.get_storage(cfg)
+                storage.upsert_logs([synthetic_entry(i) for i in range(n)])
+                logs = storage.read_logs()
+                apps = app_dictionary().snapshot()[0]
+                feat = features_from_logs(logs, cfg, apps)
+                t0 = time.perf_counter()
+                compute_scores(persist=False)
+                wrapper_ms = (time.perf_counter() - t0) * 1000
+                rows.append({
+                    "days": n,
+                    "pure_calls_s": rate(lambda: scores_from_logs(logs, cfg, apps)),
+                    "score_only_calls_s": rate(lambda: score_frame(feat, cfg)),
+                    "wrapper_ms": wrapper_ms,
+                })
+    finally:
+        io.ROOT = old_root
+    return rows
+
+
+def bench_config_change(sizes=(1_000, 10_000)) -> list[dict]:
+    """
+    Scores page after a settings save: full recompute vs only the affected columns.
+
+    "full" is what a save used to cost: the next run_stage("scores") misses the
+    cache and recomputes (rebuilding daily_features too when the app lists
+    change). "diff" runs update_for_config() on save, then the same
+    run_stage("scores"), which is then a cache hit.
+
+    Args:
+        sizes: Days of history
+
+    Returns:
+        list: One row per (size, setting changed) with seconds for both paths
+    """
+    import copy
+    import json
+    import utils.io_utils as io
+    import scripts.pipeline as pl
+    with open(os.path.join(os.path.dirname(__file__), "..", "config", "config.json"), encoding="utf-8") as f:
+        base = json.load(f)
+
+    def move_instagram(c):
+        c["screen_time"]["distracting_apps"].remove("Instagram")
+        c["screen_time"]["productive_apps"].append("Instagram")
+
+    edits = {
+        "weights": lambda c: c["weights"].__setitem__("sleep", 0.4),
+        "sleep": lambda c: c["sleep"].__setitem__("ideal_min_hours", 6.0),
+        "app_lists": move_instagram,
+    }
+    old_root = io.ROOT
+    rows = []
+    try:
+        for n in sizes:
+            with tempfile.TemporaryDirectory() as d:
+                io.ROOT = d
+                io.ensure_dirs()
+                io.write_config(base)
+                storage = io.get_storage(base)
+                storage.upsert_logs([synthetic_entry(i) for i in range(n)])
+                for name, edit in edits.items():
+                    new = copy.deepcopy(base)
+                    edit(new)
+                    row = {"days": n, "setting": name, "columns": len(pl.affected_columns(base, new))}
+                    for mode in ("full", "diff"):
+                        # Start from a warm cache for the old settings, nothing for the new
+                        io.write_config(base)
+                        pl.run_stage("scores")
+                        keys = pl.stage_keys(new, storage.log_fingerprint())
+                        cache = pl.artifact_cache()
+                        for stage in ("features", "scores"):
+                            path = os.path.join(cache.directory, f"{keys[stage]}.pkl")
+                            if os.path.exists(path):
+                                os.remove(path)
+                        t0 = time.perf_counter()
+                        io.write_config(new)
+                        if mode == "diff":
+                            pl.update_for_config(base, new)
+                        pl.run_stage("scores")
+                        row[f"{mode}_s"] = time.perf_counter() - t0
+                    rows.append(row)
+    finally:
+        io.ROOT = old_root
+    return rows
+
+
+def bench_config_versions(sizes=(1_000, 10_000, 100_000)) -> list[dict]:
+    """
+    Going back to an earlier config version, and comparing against it: cache hit vs recompute.
+
+    Two versions differing in the weights or in the app lists. "switch" saves
+    the earlier version again and reads its scores; "compare" is
+    compare_versions(). The *_miss_s timings drop that version's cached
+    features/scores first, as there was no per-version cache before.
+
+    Args:
+        sizes: Days of history
+
+    Returns:
+        list: One row per (size, setting changed)
+    """
+    import copy
+    import json
+    import utils.io_utils as io
+    import scripts.pipeline as pl
+    with open(os.path.join(os.path.dirname(__file__), "..", "config", "config.json"), encoding="utf-8") as f:
+        base = json.load(f)
+
+    def move_instagram(c):
+        c["screen_time"]["distracting_apps"].remove("Instagram")
+        c["screen_time"]["productive_apps"].append("Instagram")
+
+    edits = {"weights": lambda c: c["weights"].__setitem__("sleep", 0.4), "app_lists": move_instagram}
+
+    def save(old, new):
+        io.write_config(new)
+        pl.update_for_config(old, new)
+
+    def drop_cached(new):
+        # Remove the base version's features/scores entries (those not shared with new)
+        fingerprint = io.get_storage().log_fingerprint()
+        keys, kept = pl.stage_keys(base, fingerprint), pl.stage_keys(new, fingerprint)
+        for stage in ("features", "scores"):
+            path = os.path.join(pl.artifact_cache().directory, f"{keys[stage]}.pkl")
+            if keys[stage] != kept[stage] and os.path.exists(path):
+                os.remove(path)
+
+    old_root = io.ROOT
+    rows = []
+    try:
+        for n in sizes:
+            with tempfile.TemporaryDirectory() as d:
+                io.ROOT = d
+                io.ensure_dirs()
+                io.write_config(base)
+                storage = io.get_storage(base)
+                storage.upsert_logs([synthetic_entry(i) for i in range(n)])
+                version = io.config_version(base)
+                for name, edit in edits.items():
+                    new = copy.deepcopy(base)
+                    edit(new)
+                    row = {"days": n, "setting": name}
+                    for mode in ("hit", "miss"):
+                        # Both versions computed once, the new one saved
+                        io.write_config(base)
+                        pl.run_stage("scores")
+                        save(base, new)
+                        pl.run_stage("scores")
+                        if mode == "miss":
+                            drop_cached(new)
+                        t0 = time.perf_counter()
+                        pl.compare_versions(version)
+                        row[f"compare_{mode}_s"] = time.perf_counter() - t0
+                        if mode == "miss":
+                            drop_cached(new)
+                            t0 = time.perf_counter()
+                            # Before versioning a save simply replaced the config
+                            io.write_config(base)
+                            pl.run_stage("scores")
+                        else:
+                            t0 = time.perf_counter()
+                            save(new, base)
+                            pl.run_stage("scores")
+                        row[f"switch_{mode}_s"] = time.perf_counter() - t0
+                    rows.append(row)
+    finally:
+        io.ROOT = old_root
+    return rows
+
+
+def _print_rows(rows: list[dict]) -> None:
+    if not rows:
+        return
+    cols = list(rows[0].keys())
+    print("  ".join(f"{c:>14}" for c in cols))
+    for r in rows:
+        print("  ".join(f"{r[c]:>14.3f}" if isinstance(r[c], float) else f"{r[c]:>14}" for c in cols))
+
+
+BENCHMARKS = {
+    "journal": bench_journal_append,
+    "writer": bench_background_writer,
+    "tickets": bench_writer_tickets,
+    "concurrent": bench_concurrent_appends,
+    "streaming": bench_streaming_reader,
+    "archive": bench_cold_archive,
+    "codecs": bench_codecs,
+    "apps": bench_app_encoding,
+    "features": bench_features,
+    "incremental": bench_incremental_features,
+    "chunked": bench_chunked_pipeline,
+    "stagecache": bench_stage_cache,
+    "insights": bench_insights_handoff,
+    "pure": bench_pure_scoring,
+    "configdiff": bench_config_change,
+    "versions": bench_config_versions,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        _print_rows(BENCHMARKS[name]())
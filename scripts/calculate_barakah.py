@@ -1,152 +1,297 @@
-from __future__ import annotations
-import pandas as pd
-from typing import Dict, Any
-from utils.io_utils import ROOT, ensure_dirs, read_config, save_df_csv
-from utils.scoring import (
-    score_prayer, score_quran, score_dhikr, score_sadaqah, score_sleep,
-    score_screen_time, score_other, weighted_baraka_score
-)
-from scripts.process_data import build_features
-
-
-def compute_scores() -> pd.DataFrame:
-    """
-    Compute daily Baraka scores based on various spiritual activities and metrics.
-
-    Returns:
-        pd.DataFrame: DataFrame containing daily scores and metrics
-    """
-    # Ensure necessary directories exist
-    ensure_dirs()
-
-    # Read configuration
-    cfg = read_config()
-
-    # Build features from raw data
-    feat = build_features()
-
-    # Return empty DataFrame if no features available
-    if feat.empty:
-        return pd.DataFrame()
-
-    rows = []
-    for _, row in feat.iterrows():
-        # Calculate score components
-        components = calculate_score_components(row, cfg)
-
-        # Calculate overall weighted Baraka score
-        score = weighted_baraka_score(components, cfg["weights"])
-
-        # Append results
-        rows.append({
-            "date": row["date"],
-            **components,
-            "baraka_score": score,
-            "clarity": row.get("clarity"),
-            "focus": row.get("focus"),
-            "calm": row.get("calm"),
-            "productivity": row.get("productivity")
-        })
-
-    # Create output DataFrame and sort by date
-    out = pd.DataFrame(rows).sort_values("date")
-
-    # Save results
-    save_df_csv(out, "data/processed/baraka_scores.csv")
-
-    # Save outcomes separately
-    outcomes = out[["date", "clarity", "focus", "calm", "productivity"]]
-    save_df_csv(outcomes, "data/processed/outcomes.csv")
-
-    return out
-
-
-def calculate_score_components(row: pd.Series, cfg: Dict[str, Any]) -> Dict[str, float]:
-    """
-    Calculate individual score components for Baraka calculation.
-
-    Args:
-        row: Row from features DataFrame
-        cfg: Configuration dictionary
-
-    Returns:
-        Dictionary containing all score components
-    """
-    components = {}
-
-    # Prayer score
-    components["prayer_on_time"] = row["prayer_on_time"] * 100.0
-
-    # Quran recitation score
-    quran_max = cfg["quran"]["max_daily_points"]
-    quran_items = row.get("quran_items", 0)
-    components["quran_recitation"] = min(100.0, (quran_items / quran_max) * 100.0)
-
-    # Dhikr score
-    dhikr_config = cfg["dhikr"]
-    dhikr_reps = row.get("dhikr_reps", 0)
-    dhikr_points = dhikr_reps * dhikr_config["points_per_repetition"]
-    components["dhikr"] = min(100.0, (dhikr_points / dhikr_config["max_daily_points"]) * 100.0)
-
-    # Sadaqah score
-    sadaqah_amount = float(row.get("sadaqah_amount", 0.0))
-    sadaqah_config = cfg["sadaqah"]
-    components["sadaqah"] = score_sadaqah(
-        sadaqah_amount,
-        sadaqah_config["log_scale"],
-        sadaqah_config["log_base"],
-        sadaqah_config["max_daily_points"]
-    )
-
-    # Sleep score
-    sleep_hours = float(row.get("sleep_hours", 0.0))
-    bedtime = str(row.get("bedtime", "")) or None
-    sleep_config = cfg["sleep"]
-    components["sleep"] = score_sleep(
-        sleep_hours,
-        bedtime,
-        sleep_config["ideal_min_hours"],
-        sleep_config["ideal_max_hours"],
-        sleep_config["bedtime_bonus_before"],
-        sleep_config["max_daily_points"]
-    )
-
-    # Screen time score
-    screen_time_data = {
-        "productive": row.get("prod_minutes", 0.0),
-        "distracting": row.get("dist_minutes", 0.0)
-    }
-    screen_time_config = {
-        "productive_apps": ["productive"],
-        "distracting_apps": ["distracting"],
-        "max_daily_minutes": cfg["screen_time"]["max_daily_minutes"]
-    }
-    components["screen_time"] = score_screen_time(screen_time_data, screen_time_config)
-
-    # Other activities scores
-    other_config = cfg["other"]
-    other_good = int(row.get("other_good", 0))
-    other_bad = int(row.get("other_bad", 0))
-    components["other_good"] = score_other(
-        other_good, 0,
-        other_config["good_points"],
-        other_config["bad_points"]
-    )
-    components["other_bad"] = score_other(
-        0, other_bad,
-        other_config["good_points"],
-        other_config["bad_points"]
-    )
-
-    return components
-
-
-if __name__ == "__main__":
-    try:
-        df = compute_scores()
-        print("Baraka scores calculated successfully!")
-        print("\nLatest scores:")
-        print(df.tail())
-    except Exception as e:
-        print(f"Error calculating Baraka scores: {e}")
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Iterable, Sequence
+from utils.io_utils import ensure_dirs, read_config, get_storage
+from utils.scoring import (
+    score_sadaqah, score_sleep, score_screen_time, score_other,
+    capped_points_array, score_sadaqah_array, score_sleep_array,
+    score_screen_time_array, score_other_array, weighted_baraka_array
+)
+from scripts.process_barakah import OUTCOME_COLUMNS, build_features, features_from_logs
+
+# Bump when the scoring rules change so cached scores are recomputed
+SCORES_VERSION = 1
+
+# Component columns of score_frame, in output order
+COMPONENT_COLUMNS = ("prayer_on_time", "quran_recitation", "dhikr", "sadaqah", "sleep",
+                     "screen_time", "other_good", "other_bad")
+
+
+def compute_scores(start: str | None = None, end: str | None = None,
+                   user: str | None = None, features: pd.DataFrame | None = None,
+                   persist: bool = True) -> pd.DataFrame:
+    """
+    Compute daily Baraka scores based on various spiritual activities and metrics.
+
+    Args:
+        start: First day to include (YYYY-MM-DD), or None for the beginning of history
+        end: Last day to include (YYYY-MM-DD), or None for the latest day
+        user: Whose shard to read and write, or None for the single-user layout
+        features: Output of build_features for [start, end], if already built
+        persist: Write the full-history barakah_scores / outcomes tables
+
+    Returns:
+        pd.DataFrame: DataFrame containing daily scores and metrics
+    """
+    # Ensure necessary directories exist
+    ensure_dirs(user)
+
+    # Read configuration
+    cfg = read_config(user)
+
+    # Build features from raw data, unless the caller already has them
+    feat = build_features(start, end, user) if features is None else features
+
+    # Return empty DataFrame if no features available
+    if feat.empty:
+        return pd.DataFrame()
+
+    out = score_frame(feat, cfg)
+
+    # A date-range view must not overwrite the full-history tables
+    if persist and start is None and end is None:
+        save_scores(out, user)
+
+    return out
+
+
+def save_scores(scores: pd.DataFrame, user: str | None = None) -> None:
+    """
+    Write full-history scores to the barakah_scores and outcomes tables.
+
+    Args:
+        scores: Output of compute_scores for the whole history
+        user: Whose shard to write to
+    """
+    if scores.empty:
+        return
+    storage = get_storage(user=user)
+    storage.write_table("barakah_scores", scores)
+
+    # Save outcomes separately
+    outcomes = scores[["date", "clarity", "focus", "calm", "productivity"]]
+    storage.write_table("outcomes", outcomes)
+
+
+def score_frame(feat: pd.DataFrame, cfg: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Score each row of a features frame.
+
+    Args:
+        feat: Output of build_features (any subset of days)
+        cfg: Configuration dictionary
+
+    Returns:
+        pd.DataFrame: Component scores, baraka_score and outcomes per day, sorted by date
+    """
+    # Whole columns at a time; the same numbers calculate_score_components gives per row
+    components = score_columns(feat, cfg)
+    out = {"date": feat["date"].to_numpy(), **components,
+           "baraka_score": weighted_baraka_array(components, cfg["weights"], len(feat))}
+    for k in OUTCOME_COLUMNS:
+        out[k] = feat[k].to_numpy() if k in feat else None
+    # Sorted by date, as a sort_values() would leave it (rows keep their positions as index)
+    order = np.argsort(out["date"], kind="stable")
+    if (order == np.arange(len(order))).all():
+        return pd.DataFrame(out)
+    return pd.DataFrame({k: v if v is None else v[order] for k, v in out.items()}, index=order)
+
+
+def score_columns(feat: pd.DataFrame, cfg: Dict[str, Any],
+                  components: Iterable[str] = COMPONENT_COLUMNS) -> Dict[str, np.ndarray]:
+    """
+    Column-wise calculate_score_components for every row of feat.
+
+    Args:
+        feat: Output of build_features
+        cfg: Configuration dictionary
+        components: Which components to compute (default: all of them)
+
+    Returns:
+        Dictionary of component name -> float array aligned to feat's rows
+    """
+    def col(name, default):
+        return feat[name].to_numpy() if name in feat else np.full(len(feat), default)
+
+    wanted = set(components)
+    out = {}
+    if "prayer_on_time" in wanted:
+        out["prayer_on_time"] = col("prayer_on_time", np.nan) * 100.0
+    if "quran_recitation" in wanted:
+        out["quran_recitation"] = capped_points_array(
+            col("quran_items", 0), cfg["quran"]["max_daily_points"])
+
+    if "dhikr" in wanted:
+        dhikr_config = cfg["dhikr"]
+        out["dhikr"] = capped_points_array(
+            col("dhikr_reps", 0) * dhikr_config["points_per_repetition"], dhikr_config["max_daily_points"])
+
+    if "sadaqah" in wanted:
+        sadaqah_config = cfg["sadaqah"]
+        out["sadaqah"] = score_sadaqah_array(
+            col("sadaqah_amount", 0.0),
+            sadaqah_config["log_scale"],
+            sadaqah_config["log_base"],
+            sadaqah_config["max_daily_points"]
+        )
+
+    if "sleep" in wanted:
+        sleep_config = cfg["sleep"]
+        out["sleep"] = score_sleep_array(
+            col("sleep_hours", 0.0),
+            col("bedtime", ""),
+            sleep_config["ideal_min_hours"],
+            sleep_config["ideal_max_hours"],
+            sleep_config["bedtime_bonus_before"],
+            sleep_config["max_daily_points"]
+        )
+
+    if "screen_time" in wanted:
+        out["screen_time"] = score_screen_time_array(
+            col("prod_minutes", 0.0), col("dist_minutes", 0.0), cfg["screen_time"]["max_daily_minutes"])
+
+    other_config = cfg["other"] if wanted & {"other_good", "other_bad"} else None
+    if "other_good" in wanted:
+        good = col("other_good", 0).astype(int)
+        out["other_good"] = score_other_array(good, 0, other_config["good_points"], other_config["bad_points"])
+    if "other_bad" in wanted:
+        bad = col("other_bad", 0).astype(int)
+        out["other_bad"] = score_other_array(0, bad, other_config["good_points"], other_config["bad_points"])
+    return out
+
+
+def rescore(scores: pd.DataFrame, feat: pd.DataFrame, cfg: Dict[str, Any],
+            columns: Iterable[str]) -> pd.DataFrame:
+    """
+    Scores for a new config from the old ones, recomputing only the columns it changes.
+
+    Args:
+        scores: score_frame output for feat under the previous config
+        feat: Features the scores were computed from (for the new config)
+        cfg: New configuration dictionary
+        columns: Score columns the config change affects; baraka_score is always redone
+
+    Returns:
+        pd.DataFrame: Same as score_frame(feat, cfg)
+    """
+    if len(scores) != len(feat) or not np.array_equal(scores["date"].astype(str).to_numpy(),
+                                                      feat["date"].astype(str).to_numpy()):
+        return score_frame(feat, cfg)
+    out = scores.copy()
+    for name, values in score_columns(feat, cfg, [c for c in COMPONENT_COLUMNS if c in set(columns)]).items():
+        out[name] = values
+    components = {c: out[c].to_numpy() for c in COMPONENT_COLUMNS}
+    out["baraka_score"] = weighted_baraka_array(components, cfg["weights"], len(out))
+    return out
+
+
+def scores_from_logs(logs: pd.DataFrame, cfg: Dict[str, Any],
+                     apps: Sequence[str] | None = None) -> pd.DataFrame:
+    """
+    Daily scores straight from log rows, without touching disk.
+
+    Args:
+        logs: Daily log rows, one per day (e.g. storage.read_logs(), or entries being edited)
+        cfg: Configuration dictionary
+        apps: App dictionary names in id order; required when rows are stored with app_ids
+
+    Returns:
+        pd.DataFrame: As compute_scores (empty when there are no logs)
+
+    Raises:
+        ValueError: If logs hold app_ids and apps is None
+    """
+    feat = features_from_logs(logs, cfg, apps)
+    return pd.DataFrame() if feat.empty else score_frame(feat, cfg)
+
+
+def calculate_score_components(row: pd.Series, cfg: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Calculate individual score components for Baraka calculation.
+
+    Args:
+        row: Row from features DataFrame
+        cfg: Configuration dictionary
+
+    Returns:
+        Dictionary containing all score components
+    """
+    components = {}
+
+    # Prayer score
+    components["prayer_on_time"] = row["prayer_on_time"] * 100.0
+
+    # Quran recitation score
+    quran_max = cfg["quran"]["max_daily_points"]
+    quran_items = row.get("quran_items", 0)
+    components["quran_recitation"] = min(100.0, (quran_items / quran_max) * 100.0)
+
+    # Dhikr score
+    dhikr_config = cfg["dhikr"]
+    dhikr_reps = row.get("dhikr_reps", 0)
+    dhikr_points = dhikr_reps * dhikr_config["points_per_repetition"]
+    components["dhikr"] = min(100.0, (dhikr_points / dhikr_config["max_daily_points"]) * 100.0)
+
+    # Sadaqah score
+    sadaqah_amount = float(row.get("sadaqah_amount", 0.0))
+    sadaqah_config = cfg["sadaqah"]
+    components["sadaqah"] = score_sadaqah(
+        sadaqah_amount,
+        sadaqah_config["log_scale"],
+        sadaqah_config["log_base"],
+        sadaqah_config["max_daily_points"]
+    )
+
+    # Sleep score
+    sleep_hours = float(row.get("sleep_hours", 0.0))
+    bedtime = str(row.get("bedtime", "")) or None
+    sleep_config = cfg["sleep"]
+    components["sleep"] = score_sleep(
+        sleep_hours,
+        bedtime,
+        sleep_config["ideal_min_hours"],
+        sleep_config["ideal_max_hours"],
+        sleep_config["bedtime_bonus_before"],
+        sleep_config["max_daily_points"]
+    )
+
+    # Screen time score
+    screen_time_data = {
+        "productive": row.get("prod_minutes", 0.0),
+        "distracting": row.get("dist_minutes", 0.0)
+    }
+    screen_time_config = {
+        "productive_apps": ["productive"],
+        "distracting_apps": ["distracting"],
+        "max_daily_minutes": cfg["screen_time"]["max_daily_minutes"]
+    }
+    components["screen_time"] = score_screen_time(screen_time_data, screen_time_config)
+
+    # Other activities scores
+    other_config = cfg["other"]
+    other_good = int(row.get("other_good", 0))
+    other_bad = int(row.get("other_bad", 0))
+    components["other_good"] = score_other(
+        other_good, 0,
+        other_config["good_points"],
+        other_config["bad_points"]
+    )
+    components["other_bad"] = score_other(
+        0, other_bad,
+        other_config["good_points"],
+        other_config["bad_points"]
+    )
+
+    return components
+
+
+if __name__ == "__main__":
+    try:
+        df = compute_scores()
+        print("Baraka scores calculated successfully!")
+        print("\nLatest scores:")
+        print(df.tail())
+    except Exception as e:
+        print(f"Error calculating Baraka scores: {e}")
         # Optionally, you could log this error to a file
\ No newline at end of file
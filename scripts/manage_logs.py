@@ -0,0 +1,166 @@
+# scripts/manage_logs.py
+from __future__ import annotations
+import argparse
+import math
+import os
+from utils.io_utils import ensure_dirs, get_storage, migrate_logs_to_journal, read_config, user_root
+
+
+def cmd_migrate(args: argparse.Namespace) -> None:
+    """
+    Move the legacy daily_logs.json array into the append-only journal.
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    moved = migrate_logs_to_journal(args.src, args.dst, user=args.user)
+    print(f"Migrated {moved} entries to the journal.")
+
+
+def cmd_compact(args: argparse.Namespace) -> None:
+    """
+    Drop superseded records so the log store holds exactly one entry per day.
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    kept, dropped = get_storage(user=args.user).compact_logs()
+    print(f"Kept {kept} days, dropped {dropped} superseded entries.")
+
+
+def cmd_segment(args: argparse.Namespace) -> None:
+    """
+    Split the journal into monthly segments under data/raw/logs/.
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    from utils.segments import migrate_to_segments
+    n = migrate_to_segments(args.user)
+    print(f"Moved {n} days into monthly segments; set storage.backend to \"segmented\" to write there.")
+
+
+def cmd_archive(args: argparse.Namespace) -> None:
+    """
+    Gzip monthly segments older than storage.archive_after_days (or --days).
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    from utils.segments import DEFAULT_ARCHIVE_AFTER_DAYS, segment_store
+    days = args.days
+    if days is None:
+        days = read_config(args.user).get("storage", {}).get("archive_after_days", DEFAULT_ARCHIVE_AFTER_DAYS)
+    months = segment_store(args.user).archive(days)
+    print(f"Archived {len(months)} segments: {', '.join(months) or '-'}")
+
+
+def cmd_rollup(args: argparse.Namespace) -> None:
+    """
+    Apply the retention policy: roll up days older than retention.detail_months.
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    from scripts.retention import apply_retention
+    result = apply_retention(args.user)
+    print(f"Added {result['weekly']} weekly and {result['monthly']} monthly rollups; "
+          f"removed {result['dropped']} raw records.")
+
+
+def cmd_to_binary(args: argparse.Namespace) -> None:
+    """
+    Copy file-backed logs into the fixed-width binary day store.
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    from utils.binary_store import migrate_to_binary
+    n = migrate_to_binary(args.user)
+    print(f"Stored {n} days in data/raw/binary; set storage.backend to \"binary\" to use it.")
+
+
+def cmd_to_sqlite(args: argparse.Namespace) -> None:
+    """
+    Copy every log entry of the active storage backend into a SQLite database.
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    from utils.sqlite_store import SQLiteStorage
+    # The active backend sees the journal, segments or binary store, whichever is in use
+    source = get_storage(user=args.user)
+    # Rows go under the user the sqlite backend would read for this profile
+    user = source.user or read_config(args.user).get("storage", {}).get("user", "default")
+    store = SQLiteStorage(os.path.join(user_root(args.user), args.db), user=user)
+    logs = source.read_logs()
+    entries = [
+        {k: v for k, v in rec.items() if not (isinstance(v, float) and math.isnan(v))}
+        for rec in logs.to_dict("records")
+    ]
+    store.upsert_logs(entries)
+    n = len(entries)
+    print(f"Imported {n} entries into {args.db}; set storage.backend to \"sqlite\" to use it.")
+
+
+def cmd_rebuild(args: argparse.Namespace) -> None:
+    """
+    Rebuild features and scores out of core (pipeline.batch_days / pipeline.memory_mb).
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    from scripts.backfill import build_chunked
+    users = [args.user]
+    if args.all_users:
+        shards = os.path.join(user_root(), "users")
+        users = [None] + (sorted(os.listdir(shards)) if os.path.isdir(shards) else [])
+    for user in users:
+        stats = build_chunked(user, batch_days=args.batch_days, memory_mb=args.memory_mb)
+        print(f"{user or '(default)'}: {stats['days']} days in {stats['batches']} batches, "
+              f"peak {stats['peak_bytes'] / 2**20:.1f} MB of {stats['budget_bytes'] / 2**20:.0f} MB.")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintenance tasks for raw daily logs.")
+    parser.add_argument("--user", default=None, help="user shard to operate on (default: the single-user layout)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate", help="convert daily_logs.json to daily_logs.jsonl")
+    p.add_argument("--src", default=None, help="legacy JSON array (default: data/raw/daily_logs.json)")
+    p.add_argument("--dst", default=None, help="journal to create (default: data/raw/daily_logs.jsonl)")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("compact", help="rewrite the log store with one record per day")
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser("segment", help="split logs into monthly segments")
+    p.set_defaults(func=cmd_segment)
+
+    p = sub.add_parser("archive", help="gzip cold monthly segments")
+    p.add_argument("--days", type=int, default=None, help="archive segments older than this many days")
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser("rollup", help="fold days past the retention window into weekly/monthly rollups")
+    p.set_defaults(func=cmd_rollup)
+
+    p = sub.add_parser("to-binary", help="copy logs into the memory-mapped binary day store")
+    p.set_defaults(func=cmd_to_binary)
+
+    p = sub.add_parser("to-sqlite", help="import file-backed logs into a SQLite database")
+    p.add_argument("--db", default=os.path.join("data", "barakah.db"), help="database path relative to the user's root")
+    p.set_defaults(func=cmd_to_sqlite)
+
+    p = sub.add_parser("rebuild", help="rebuild features and scores in fixed-size batches")
+    p.add_argument("--batch-days", type=int, default=None, help="most days per batch (default: pipeline.batch_days)")
+    p.add_argument("--memory-mb", type=float, default=None, help="memory budget per batch (default: pipeline.memory_mb)")
+    p.add_argument("--all-users", action="store_true", help="the single-user layout and every shard under users/")
+    p.set_defaults(func=cmd_rebuild)
+
+    args = parser.parse_args(argv)
+    ensure_dirs(args.user)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+# scripts/pipeline.py
+from __future__ import annotations
+import copy
+import hashlib
+import pandas as pd
+from typing import Any, Callable, Dict, Set
+from utils.io_utils import COMPACT_JSON, config_for_version, ensure_dirs, read_config, get_storage
+from utils.stage_cache import DEFAULT_CACHE_MB, artifact_cache
+from scripts.process_barakah import (
+    FEATURES_VERSION, _prepare, build_features, features_config_hash, update_screen_minutes
+)
+from scripts.calculate_barakah import COMPONENT_COLUMNS, SCORES_VERSION, rescore, save_scores, score_frame
+from scripts.barakah_model import MODEL_VERSION, save_results, train_and_analyze
+
+# The derived data as a DAG of stages:
+#
+#   logs -> features -> scores -> persist
+#                    -> model  -^
+#
+# Stages hand their outputs to each other in memory; "persist" (writing the
+# barakah_scores / outcomes tables and models/feature_importances.json) is
+# only run when asked for. daily_features is still stored by build_features,
+# as it is the base for its incremental updates.
+#
+# Each stage's output is cached on disk (utils.stage_cache) under a key hashing
+# the stage's code version, the config sections it reads and the keys of its
+# inputs; "logs" is keyed by the log store's fingerprint. A page render with no
+# new saves and no settings change gets every stage from the cache.
+#
+# config.json -> "cache": {"max_mb": N} bounds the cache directory.
+#
+# A settings save goes through update_for_config(): the cached features and
+# scores are carried over to the new config's keys with only the columns the
+# change affects recomputed (see CONFIG_DEPENDENCIES), so the next render is a
+# cache hit rather than a recompute from the raw logs.
+#
+# Saved configs are versioned (utils.io_utils.config_history). Results for
+# earlier versions live in the same cache, keyed the same way, so
+# version_scores() / compare_versions() on a recently used version are hits.
+
+# Config sections each score component reads (see calculate_score_components)
+SCORE_SECTIONS = ("weights", "quran", "dhikr", "sadaqah", "sleep", "screen_time", "other")
+
+# Setting ("section" or "section.key") -> the feature / score columns computed
+# from it. baraka_score is also redone whenever any component changes.
+CONFIG_DEPENDENCIES = {
+    "screen_time.productive_apps": ("prod_minutes", "screen_time"),
+    "screen_time.distracting_apps": ("dist_minutes", "screen_time"),
+    "screen_time.max_daily_minutes": ("screen_time",),
+    "weights": ("baraka_score",),
+    "quran": ("quran_recitation",),
+    "dhikr": ("dhikr",),
+    "sadaqah": ("sadaqah",),
+    "sleep": ("sleep",),
+    "other": ("other_good", "other_bad"),
+}
+
+
+class Stage:
+    # run(user, cfg, inputs) gets the outputs of deps (other than "logs") by name
+    def __init__(self, deps: tuple, config: tuple, version: int,
+                 run: Callable[[str | None, dict, Dict[str, Any]], Any]):
+        self.deps = deps
+        self.config = config
+        self.version = version
+        self.run = run
+
+
+def _features(user: str | None, cfg: dict, inputs: Dict[str, Any]) -> pd.DataFrame:
+    if features_config_hash(cfg) == features_config_hash(read_config(user)):
+        return build_features(user=user)
+    # An earlier config version's app lists: computed aside, the stored table stays current
+    storage = get_storage(user=user)
+    logs = storage.read_logs()
+    return pd.DataFrame() if logs.empty else _prepare(storage, cfg, logs)
+
+
+def _scores(user: str | None, cfg: dict, inputs: Dict[str, Any]) -> pd.DataFrame:
+    feat = inputs["features"]
+    return pd.DataFrame() if feat.empty else score_frame(feat, cfg)
+
+
+def _model(user: str | None, cfg: dict, inputs: Dict[str, Any]) -> dict:
+    return train_and_analyze(user, features=inputs["features"], persist=False)
+
+
+def _persist(user: str | None, cfg: dict, inputs: Dict[str, Any]) -> bool:
+    save_scores(inputs["scores"], user)
+    save_results(inputs["model"], user)
+    return True
+
+
+# In dependency order
+STAGES: Dict[str, Stage] = {
+    "features": Stage(("logs",), ("screen_time.productive_apps", "screen_time.distracting_apps"),
+                      FEATURES_VERSION, _features),
+    "scores": Stage(("features",), SCORE_SECTIONS, SCORES_VERSION, _scores),
+    "model": Stage(("features",), (), MODEL_VERSION, _model),
+    "persist": Stage(("scores", "model"), (), 1, _persist),
+}
+
+
+def _digest(obj: Any) -> str:
+    return hashlib.sha256(COMPACT_JSON.encode(obj)).hexdigest()
+
+
+def _setting(cfg: dict, path: str) -> Any:
+    # "section.key" -> cfg[section][key] (None when absent)
+    value = cfg
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def affected_columns(old_cfg: dict, cfg: dict) -> Set[str]:
+    """
+    Feature and score columns whose values differ between two configs.
+
+    Args:
+        old_cfg: Configuration before the change
+        cfg: Configuration after it
+
+    Returns:
+        set: Column names from CONFIG_DEPENDENCIES (empty when no derived data changes)
+    """
+    columns = set()
+    for path, deps in CONFIG_DEPENDENCIES.items():
+        if _setting(old_cfg, path) != _setting(cfg, path):
+            columns.update(deps)
+    if columns & set(COMPONENT_COLUMNS):
+        columns.add("baraka_score")
+    return columns
+
+
+def stage_keys(cfg: dict, fingerprint: Any) -> Dict[str, str]:
+    """
+    Cache key of every stage, given the config and the log store's fingerprint.
+
+    Args:
+        cfg: Configuration dictionary
+        fingerprint: Storage.log_fingerprint() of the user's log store
+
+    Returns:
+        dict: Stage name ("logs" included) -> hex key
+    """
+    keys = {"logs": _digest(["logs", fingerprint])}
+    for name, stage in STAGES.items():
+        keys[name] = _digest([name, stage.version, {s: _setting(cfg, s) for s in stage.config},
+                              [keys[d] for d in stage.deps]])
+    return keys
+
+
+def _cache(cfg: dict, user: str | None):
+    return artifact_cache(user, int(float(cfg.get("cache", {}).get("max_mb", DEFAULT_CACHE_MB)) * 2**20))
+
+
+def run_stage(name: str, user: str | None = None, cfg: dict | None = None) -> Any:
+    """
+    Output of one stage, from the cache when neither its inputs nor its config changed.
+
+    Args:
+        name: "features", "scores", "model" or "persist"
+        user: Whose shard to use, or None for the single-user layout
+        cfg: Settings to compute with (default: the saved ones); storage and
+            cache settings always come from the saved config
+
+    Returns:
+        The stage's output (frames are copies the caller may modify)
+    """
+    ensure_dirs(user)
+    current = read_config(user)
+    cfg = current if cfg is None else cfg
+    if name == "persist" and cfg != current:
+        raise ValueError("Only the saved config's results are exported")
+    keys = stage_keys(cfg, get_storage(current, user).log_fingerprint())
+    return _resolve(name, user, cfg, keys, _cache(current, user))
+
+
+def version_scores(version: str, user: str | None = None) -> pd.DataFrame:
+    """
+    Full-history scores under an earlier saved config, for the current logs.
+
+    Every config version's scores are cached side by side (least recently used
+    dropped first), so going back to, or comparing against, a recent version
+    is a cache hit; otherwise they are recomputed from the cached features.
+
+    Args:
+        version: Version hash from io_utils.config_history (a unique prefix is enough)
+        user: Whose shard to use, or None for the single-user layout
+
+    Returns:
+        pd.DataFrame: As run_stage("scores")
+
+    Raises:
+        KeyError: Unknown version
+    """
+    return run_stage("scores", user, config_for_version(version, user))
+
+
+def compare_versions(old: str, new: str | None = None, user: str | None = None) -> pd.DataFrame:
+    """
+    Daily baraka_score under two config versions side by side.
+
+    Args:
+        old: Version hash of the first config
+        new: Version hash of the second, or None for the saved config
+        user: Whose shard to use, or None for the single-user layout
+
+    Returns:
+        pd.DataFrame: date, baraka_score_old, baraka_score_new and delta (new - old)
+    """
+    a = version_scores(old, user)
+    b = run_stage("scores", user) if new is None else version_scores(new, user)
+    if a.empty or b.empty:
+        return pd.DataFrame(columns=["date", "baraka_score_old", "baraka_score_new", "delta"])
+    out = a[["date", "baraka_score"]].merge(b[["date", "baraka_score"]], on="date", suffixes=("_old", "_new"))
+    out["delta"] = out["baraka_score_new"] - out["baraka_score_old"]
+    return out
+
+
+def update_for_config(old_cfg: dict, cfg: dict, user: str | None = None) -> Set[str]:
+    """
+    Carry cached results over to a just-saved config, recomputing only what it changes.
+
+    App-list changes redo prod_minutes / dist_minutes (stored daily_features
+    included) and the screen_time component; any other score setting redoes its
+    own component(s); baraka_score follows. Whatever is not cached under the old
+    config is left for the next run_stage() to compute as usual.
+
+    Args:
+        old_cfg: Configuration before the save
+        cfg: Configuration saved
+        user: Whose shard to update, or None for the single-user layout
+
+    Returns:
+        set: The affected columns (see affected_columns)
+    """
+    columns = affected_columns(old_cfg, cfg)
+    if not columns:
+        return columns
+    fingerprint = get_storage(cfg, user).log_fingerprint()
+    before, after = stage_keys(old_cfg, fingerprint), stage_keys(cfg, fingerprint)
+    cache = _cache(cfg, user)
+    feat = cache.get(before["features"])
+    if feat is None:
+        return columns
+    if after["features"] != before["features"]:
+        # Back to a config version whose features are still cached: only the stored table follows
+        cached = cache.get(after["features"])
+        feat = update_screen_minutes(old_cfg, cfg, user, features=cached)
+        if feat is None:
+            return columns
+        if cached is None:
+            cache.put(after["features"], feat)
+    scores = cache.get(before["scores"])
+    if scores is not None and after["scores"] != before["scores"] and cache.get(after["scores"]) is None:
+        cache.put(after["scores"], rescore(scores, feat, cfg, columns))
+    return columns
+
+
+def _resolve(name: str, user: str | None, cfg: dict, keys: Dict[str, str], cache) -> Any:
+    value = cache.get(keys[name])
+    if value is None:
+        inputs = {dep: _resolve(dep, user, cfg, keys, cache) for dep in STAGES[name].deps if dep in STAGES}
+        value = STAGES[name].run(user, cfg, inputs)
+        cache.put(keys[name], value)
+    return value.copy() if isinstance(value, pd.DataFrame) else copy.deepcopy(value)
@@ -1,118 +1,270 @@
-# scripts/process_data.py
-from __future__ import annotations
-import pandas as pd
-from utils.io_utils import ROOT, ensure_dirs, daily_logs_df, save_df_csv, read_config
-
-
-def parse_screen_time_payload(payloads):
-    """
-    Accepts list of app->minutes dicts or raw dumps; merges into per-day app minutes.
-    """
-    per_day = {}
-    for p in payloads:
-        day = p.get("date")  # YYYY-MM-DD
-        apps = p.get("apps", {})  # {app_name: minutes}
-        if not day:
-            continue
-        per_day.setdefault(day, {})
-        for a, m in apps.items():
-            per_day[day][a] = per_day[day].get(a, 0.0) + float(m)
-    return per_day
-
-
-def build_features() -> pd.DataFrame:
-    ensure_dirs()
-    cfg = read_config()
-    logs = daily_logs_df()
-    if logs.empty:
-        return pd.DataFrame()
-
-    # Normalize date
-    logs["date"] = pd.to_datetime(logs["date"]).dt.date.astype(str)
-
-    # Expand prayer booleans into numeric
-    prayer_cols = ["Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"]
-    for c in prayer_cols:
-        if c not in logs.columns:
-            logs[c] = 0
-        logs[c] = logs[c].fillna(0).astype(int)
-
-    # Quran recitations: list of {surah, ayahs}
-    logs["quran_recs"] = logs.get("quran_recs", pd.Series([[]] * len(logs)))
-
-    # Dhikr counts
-    logs["dhikr_reps"] = logs.get("dhikr_reps", 0).fillna(0).astype(int)
-
-    # Sadaqah amount
-    logs["sadaqah_amount"] = logs.get("sadaqah_amount", 0.0).fillna(0.0).astype(float)
-
-    # Sleep
-    logs["sleep_hours"] = logs.get("sleep_hours", 0.0).fillna(0.0).astype(float)
-    logs["bedtime"] = logs.get("bedtime", "").fillna("")
-
-    # Other
-    logs["other_good"] = logs.get("other_good", 0).fillna(0).astype(int)
-    logs["other_bad"] = logs.get("other_bad", 0).fillna(0).astype(int)
-
-    # Outcomes
-    for k in ["clarity", "focus", "calm", "productivity"]:
-        if k not in logs:
-            logs[k] = None
-
-    # Screen time payload is already summarized in app;
-    # the app writes per-day app minutes into each entry
-    logs["app_minutes"] = logs.get("app_minutes", [{} for _ in range(len(logs))])
-
-    # --- Flatten to features per day ---
-    feat = pd.DataFrame()
-    feat["date"] = logs["date"]
-
-    feat["prayer_on_time"] = logs[["Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"]].mean(axis=1)
-
-    feat["quran_items"] = logs["quran_recs"].apply(
-        lambda xs: sum(int(x.get("ayahs", 0)) for x in xs if isinstance(xs, list))
-    )
-
-    feat["dhikr_reps"] = logs["dhikr_reps"]
-    feat["sadaqah_amount"] = logs["sadaqah_amount"]
-    feat["sleep_hours"] = logs["sleep_hours"]
-    feat["bedtime"] = logs["bedtime"]
-    feat["other_good"] = logs["other_good"]
-    feat["other_bad"] = logs["other_bad"]
-
-    # Screen time split
-    def split_minutes(m):
-        prod = 0.0
-        dist = 0.0
-        prod_list = set(cfg.get("screen_time", {}).get("productive_apps", []))
-        dist_list = set(cfg.get("screen_time", {}).get("distracting_apps", []))
-        for a, mins in (m or {}).items():
-            if a in prod_list:
-                prod += float(mins)
-            if a in dist_list:
-                dist += float(mins)
-        return pd.Series({"prod_minutes": prod, "dist_minutes": dist})
-
-    split = logs["app_minutes"].apply(split_minutes)
-    feat = pd.concat([feat, split], axis=1)
-
-    # Outcomes
-    feat["clarity"] = logs["clarity"]
-    feat["focus"] = logs["focus"]
-    feat["calm"] = logs["calm"]
-    feat["productivity"] = logs["productivity"]
-
-    # Drop duplicates by date keeping last
-    feat = (
-        feat.sort_values("date")
-        .drop_duplicates("date", keep="last")
-        .reset_index(drop=True)
-    )
-
-    save_df_csv(feat, "data/processed/daily_features.csv")
-    return feat
-
-
-if __name__ == "__main__":
-    df = build_features()
-    print(df.tail())
+# scripts/process_data.py
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+import hashlib
+import os
+from typing import Dict, Sequence
+from utils.io_utils import (
+    ROOT, COMPACT_JSON, ensure_dirs, read_config, get_storage, load_json, save_json, user_root
+)
+from utils.app_dict import app_dictionary
+from utils.child_tables import app_usage_table, child_tables, sum_by_date
+
+
+def parse_screen_time_payload(payloads):
+    """
+    Accepts list of app->minutes dicts or raw dumps; merges into per-day app minutes.
+    """
+    per_day = {}
+    for p in payloads:
+        day = p.get("date")  # YYYY-MM-DD
+        apps = p.get("apps", {})  # {app_name: minutes}
+        if not day:
+            continue
+        per_day.setdefault(day, {})
+        for a, m in apps.items():
+            per_day[day][a] = per_day[day].get(a, 0.0) + float(m)
+    return per_day
+
+
+# Bump when _feature_frame changes so stored features are rebuilt from scratch
+FEATURES_VERSION = 3
+
+PRAYER_COLUMNS = ["Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"]
+OUTCOME_COLUMNS = ["clarity", "focus", "calm", "productivity"]
+
+
+def _day_strings(col: pd.Series) -> pd.Series:
+    # YYYY-MM-DD per row; NumPy parses plain ISO days directly, anything else goes through pandas
+    try:
+        days = col.to_numpy(dtype="datetime64[D]")
+    except ValueError:
+        return pd.to_datetime(col).dt.date.astype(str)
+    return pd.Series(np.datetime_as_string(days, unit="D"), index=col.index, dtype=object)
+
+
+def _column(logs: pd.DataFrame, name: str, default, dtype=None) -> np.ndarray:
+    # logs[name].fillna(default).astype(dtype), on the bare values
+    if name not in logs:
+        return np.full(len(logs), default, dtype=dtype)
+    values = logs[name].to_numpy()
+    if values.dtype.kind in "fO":
+        values = np.where(pd.isna(values), default, values)
+    return values.astype(dtype) if dtype is not None else values
+
+
+def _feature_frame(logs: pd.DataFrame, cfg: dict, children: dict, index: Dict[str, int]) -> pd.DataFrame:
+    # Whole-column operations only: nested lists arrive as flat child tables.
+    # logs["date"] is already normalised; index maps app names to child-table ids.
+    # Columns stay NumPy arrays until the one frame at the end (a few days' worth
+    # is called in tight loops, where per-Series overhead would dominate)
+    dates = logs["date"].to_numpy(dtype=object)
+    days = pd.Index(dates)
+    feat = {"date": dates}
+
+    feat["prayer_on_time"] = np.column_stack([_column(logs, c, 0, int) for c in PRAYER_COLUMNS]).mean(axis=1)
+
+    feat["quran_items"] = sum_by_date(children["recitations"], "ayahs", days).astype(int)
+
+    feat["dhikr_reps"] = _column(logs, "dhikr_reps", 0, int)
+    feat["sadaqah_amount"] = _column(logs, "sadaqah_amount", 0.0, float)
+    feat["sleep_hours"] = _column(logs, "sleep_hours", 0.0, float)
+    feat["bedtime"] = _column(logs, "bedtime", "").astype(object)
+    feat["other_good"] = _column(logs, "other_good", 0, int)
+    feat["other_bad"] = _column(logs, "other_bad", 0, int)
+
+    feat.update(_screen_minutes(children["app_usage"], days, cfg, index))
+
+    # Always float (NaN = not rated), so any batch of days gets the same dtypes
+    for k in OUTCOME_COLUMNS:
+        feat[k] = pd.to_numeric(logs[k].to_numpy(), errors="coerce").astype("float64") if k in logs \
+            else np.full(len(logs), np.nan)
+    return pd.DataFrame(feat)
+
+
+def _screen_minutes(usage: pd.DataFrame, days: pd.Index, cfg: dict,
+                    index: Dict[str, int]) -> Dict[str, np.ndarray]:
+    # Screen time split: the config lists are matched against app ids once
+    st_cfg = cfg.get("screen_time", {})
+    out = {}
+    for col, key in (("prod_minutes", "productive_apps"), ("dist_minutes", "distracting_apps")):
+        ids = [index[n] for n in set(st_cfg.get(key, [])) if n in index]
+        out[col] = sum_by_date(usage, "minutes", days, where=np.isin(usage["app_id"].to_numpy(), ids))
+    return out
+
+
+def _watermark_path(user: str | None) -> str:
+    return os.path.join(user_root(user), "data", "processed", "daily_features.watermark.json")
+
+
+def features_config_hash(cfg: dict) -> str:
+    # Only the screen-time lists change what _feature_frame computes
+    st_cfg = cfg.get("screen_time", {})
+    key = {"version": FEATURES_VERSION,
+           "productive_apps": sorted(st_cfg.get("productive_apps", [])),
+           "distracting_apps": sorted(st_cfg.get("distracting_apps", []))}
+    return hashlib.sha256(COMPACT_JSON.encode(key)).hexdigest()
+
+
+def save_feature_watermark(user: str | None, cfg: dict, token) -> None:
+    # The stored daily_features match the logs as of token, built with cfg
+    save_json(_watermark_path(user), {"config": features_config_hash(cfg), "token": token})
+
+
+def reset_feature_watermark(user: str | None = None) -> None:
+    """Force the next build_features() to rebuild everything (e.g. after days were deleted)."""
+    path = _watermark_path(user)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def features_from_logs(logs: pd.DataFrame, cfg: dict, apps: Sequence[str] | None = None,
+                       children: Dict[str, pd.DataFrame] | None = None) -> pd.DataFrame:
+    """
+    Daily features straight from log rows, without touching disk.
+
+    Args:
+        logs: Daily log rows, one per day in date order (left unmodified)
+        cfg: Configuration dictionary
+        apps: App dictionary names in id order; required when rows are stored with app_ids
+        children: Child tables of logs when the backend stores them (derived otherwise)
+
+    Returns:
+        pd.DataFrame: As build_features
+
+    Raises:
+        ValueError: If logs hold app_ids (or children hold app usage) and apps is None
+    """
+    if apps is None and _has_app_ids(logs, children):
+        # Without the names every app id would silently count as 0 minutes
+        raise ValueError("logs store app usage as app_ids; pass the app dictionary names as apps "
+                         "(app_dictionary().snapshot()[0])")
+    apps = apps or ()
+    logs = logs.copy(deep=False)
+    logs["date"] = _day_strings(logs["date"])
+    # Names from pre-dictionary {name: minutes} rows get provisional ids in this copy
+    index = {name: i for i, name in enumerate(apps)}
+    if children is None:
+        children = child_tables(logs, index)
+    return _feature_frame(logs, cfg, children, index)
+
+
+def _has_app_ids(logs: pd.DataFrame, children: Dict[str, pd.DataFrame] | None) -> bool:
+    if children is not None:
+        return not children["app_usage"].empty
+    return "app_ids" in logs and any(type(v) is list and v for v in logs["app_ids"].to_numpy(dtype=object))
+
+
+def _prepare(storage, cfg: dict, logs: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+    # The log store already holds one record per day in date order
+    children = storage.read_children(start, end) if storage.stores_children else None
+    return features_from_logs(logs, cfg, app_dictionary().snapshot()[0], children)
+
+
+def _update_features(storage, cfg: dict, user: str | None) -> pd.DataFrame | None:
+    # Merge the days written since the watermark into the stored table;
+    # None when that isn't possible and a full rebuild is needed
+    mark = load_json(_watermark_path(user), None)
+    if not mark or mark.get("config") != features_config_hash(cfg):
+        return None
+    days, token = storage.changes_since(mark.get("token"))
+    if days is None:
+        return None
+    stored = storage.read_table("daily_features")
+    if stored.empty:
+        return None
+    if not days:
+        return stored
+    days = sorted(set(days))
+    logs = storage.read_days(days)
+    if logs.empty:
+        return None
+    fresh = _prepare(storage, cfg, logs, days[0], days[-1])
+    fresh = fresh.astype({c: t for c, t in stored.dtypes.items() if c in fresh})
+    stored["date"] = stored["date"].astype(str)
+    # New days after the last stored one are appended rather than rewritten
+    appended = len(fresh) if fresh["date"].min() > stored["date"].max() else 0
+    feat = (pd.concat([stored[~stored["date"].isin(fresh["date"])], fresh], ignore_index=True)
+            .sort_values("date", kind="stable").reset_index(drop=True))
+    storage.write_table("daily_features", feat, appended=appended)
+    save_feature_watermark(user, cfg, token)
+    return feat
+
+
+def update_screen_minutes(old_cfg: dict, cfg: dict, user: str | None = None,
+                          features: pd.DataFrame | None = None) -> pd.DataFrame | None:
+    """
+    Redo only prod_minutes / dist_minutes of the stored daily_features for new app lists.
+
+    Args:
+        old_cfg: Configuration the stored table was built with
+        cfg: New configuration
+        user: Whose shard to update, or None for the single-user layout
+        features: Full-history features already built for cfg (e.g. cached for
+            an earlier config version), stored as they are
+
+    Returns:
+        pd.DataFrame: The updated full-history features, or None when the stored
+        table is not current for old_cfg (the next build_features rebuilds it)
+    """
+    storage = get_storage(cfg, user)
+    mark = load_json(_watermark_path(user), None)
+    if not mark or mark.get("config") != features_config_hash(old_cfg):
+        return None
+    days, _ = storage.changes_since(mark.get("token"))
+    if days is None or days:
+        return None
+    if features is not None:
+        storage.write_table("daily_features", features)
+        save_feature_watermark(user, cfg, mark.get("token"))
+        return features
+    feat = storage.read_table("daily_features")
+    if feat.empty:
+        return None
+    feat["date"] = feat["date"].astype(str)
+    # Only the app usage child table is needed, not the rest of _feature_frame
+    index = {name: i for i, name in enumerate(app_dictionary().snapshot()[0])}
+    if storage.stores_children:
+        usage = storage.read_children()["app_usage"]
+    else:
+        logs = storage.read_logs()
+        usage = app_usage_table(logs.assign(date=_day_strings(logs["date"])), index)
+    for col, minutes in _screen_minutes(usage, pd.Index(feat["date"].to_numpy()), cfg, index).items():
+        feat[col] = minutes
+    storage.write_table("daily_features", feat)
+    save_feature_watermark(user, cfg, mark.get("token"))
+    return feat
+
+
+def build_features(start: str | None = None, end: str | None = None,
+                   user: str | None = None) -> pd.DataFrame:
+    ensure_dirs(user)
+    cfg = read_config(user)
+    storage = get_storage(cfg, user)
+
+    # Full history: only the days saved since the last build are processed,
+    # unless the feature config changed or the log store was rewritten
+    full = start is None and end is None
+    if full:
+        feat = _update_features(storage, cfg, user)
+        if feat is not None:
+            return feat
+        # Taken before reading, so saves made during the build are picked up next time
+        token = storage.changes_since(None)[1]
+
+    logs = storage.read_logs(start, end)
+    if logs.empty:
+        return pd.DataFrame()
+    feat = _prepare(storage, cfg, logs, start, end)
+
+    # Only a full-history build replaces the stored table
+    if full:
+        storage.write_table("daily_features", feat)
+        save_feature_watermark(user, cfg, token)
+    return feat
+
+
+if __name__ == "__main__":
+    df = build_features()
+    print(df.tail())
@@ -0,0 +1,239 @@
+# scripts/retention.py
+from __future__ import annotations
+import datetime as dt
+import os
+import pandas as pd
+from utils.io_utils import ensure_dirs, get_storage, load_json, read_config, save_json, user_root
+from scripts.process_barakah import build_features, reset_feature_watermark
+from scripts.calculate_barakah import compute_scores
+
+# Retention: config.json -> "retention": {"detail_months": N}. Days older than
+# the current month and the N before it are folded into weekly and monthly
+# summary rows, then removed from the raw logs. N = 0 keeps everything.
+#
+# A written rollup period is never recomputed (its days may be gone), so only
+# complete periods are folded, and a raw day is removed only once both its week
+# and its month have been rolled up. Days logged late, into a period that is
+# already folded, are merged into its rollup row. A day that was folded once
+# can't be changed (its old values are gone): Log Day refuses it, and a copy
+# saved anyway is dropped without being counted twice.
+
+ROLLUP_TABLES = {"weekly": "weekly_rollups", "monthly": "monthly_rollups"}
+PERIODS = {"weekly": "W-SUN", "monthly": "M"}
+
+SCORE_COLUMNS = [
+    "prayer_on_time", "quran_recitation", "dhikr", "sadaqah", "sleep",
+    "screen_time", "other_good", "other_bad", "baraka_score",
+    "clarity", "focus", "calm", "productivity",
+]
+TOTAL_FEATURES = [
+    "quran_items", "dhikr_reps", "sadaqah_amount", "prod_minutes",
+    "dist_minutes", "other_good", "other_bad",
+]
+# Means over the days that have outcomes (outcome_days) rather than all days
+OUTCOME_MEANS = ["clarity", "focus", "calm", "productivity"]
+
+
+def _state_path(user: str | None) -> str:
+    # Every day counted in a rollup so far, raw or already dropped
+    return os.path.join(user_root(user), "data", "processed", "rollups.state.json")
+
+
+def folded_days(user: str | None = None) -> set:
+    """
+    Days already counted in a weekly/monthly rollup.
+
+    Args:
+        user: Whose shard to read, or None for the single-user layout
+
+    Returns:
+        set: YYYY-MM-DD strings; saving one of these days again would not reach its rollup
+    """
+    state = load_json(_state_path(user), {})
+    # "kept" is the older state layout (only the folded days not yet dropped)
+    return set(state.get("folded", state.get("kept", [])))
+
+
+def detail_start(months: int, today: dt.date | None = None) -> dt.date:
+    """
+    First day kept at full detail: the 1st of the month `months` before today's.
+
+    Args:
+        months: Full months of detail kept before the current one
+        today: Reference day (default: today)
+
+    Returns:
+        dt.date: Days before this are due for rollup
+    """
+    today = today or dt.date.today()
+    index = today.year * 12 + today.month - 1 - months
+    return dt.date(index // 12, index % 12 + 1, 1)
+
+
+def rollup(features: pd.DataFrame, scores: pd.DataFrame, granularity: str) -> pd.DataFrame:
+    """
+    Fold daily features and scores into one summary row per week or month.
+
+    Args:
+        features: Output of build_features for the days being folded
+        scores: Output of compute_scores for the same days
+        granularity: "weekly" or "monthly"
+
+    Returns:
+        pd.DataFrame: date (period start), period_end, days, outcome_days, mean
+        component scores and outcomes, total_<feature> sums and avg_sleep_hours
+    """
+    totals = features[["date", *TOTAL_FEATURES, "sleep_hours"]].rename(
+        columns={**{c: f"total_{c}" for c in TOTAL_FEATURES}, "sleep_hours": "avg_sleep_hours"})
+    df = scores[["date", *SCORE_COLUMNS]].merge(totals, on="date")
+    period = pd.to_datetime(df["date"]).dt.to_period(PERIODS[granularity])
+    grouped = df.drop(columns=["date"]).groupby(period)
+    means = [*SCORE_COLUMNS, "avg_sleep_hours"]
+    out = pd.concat([
+        grouped.size().rename("days"),
+        grouped["clarity"].count().rename("outcome_days"),
+        grouped[means].mean(),
+        grouped[[f"total_{c}" for c in TOTAL_FEATURES]].sum(),
+    ], axis=1)
+    out.insert(0, "period_end", out.index.end_time.strftime("%Y-%m-%d"))
+    out.insert(0, "date", out.index.start_time.strftime("%Y-%m-%d"))
+    return out.reset_index(drop=True)
+
+
+def merge_rollups(existing: pd.DataFrame, late: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the rollup rows of late days into the existing rows for the same periods.
+
+    Args:
+        existing: Stored rollup rows
+        late: rollup() of the late days, for periods present in existing
+
+    Returns:
+        pd.DataFrame: existing with counts and totals summed and means re-weighted
+        by day count (outcome_days for the outcome means)
+    """
+    out = existing.astype({"date": str}).set_index("date")
+    add = late.set_index("date")
+    old = out.loc[add.index]
+    merged = old.copy()
+    for col in ["days", "outcome_days", *[f"total_{c}" for c in TOTAL_FEATURES]]:
+        merged[col] = old[col] + add[col]
+    for col in [*SCORE_COLUMNS, "avg_sleep_hours"]:
+        weight = "outcome_days" if col in OUTCOME_MEANS else "days"
+        # A period with no outcomes yet has a NaN mean and zero weight
+        total = old[col].fillna(0) * old[weight] + add[col].fillna(0) * add[weight]
+        merged[col] = total / merged[weight]
+    out.loc[add.index] = merged
+    return out.reset_index()
+
+
+def apply_retention(user: str | None = None, today: dt.date | None = None) -> dict:
+    """
+    Roll up complete weeks/months older than the detail window and drop their raw days.
+
+    Args:
+        user: Whose shard to maintain, or None for the single-user layout
+        today: Reference day (default: today)
+
+    Returns:
+        dict: Rollup rows added per table, late days merged into existing rows
+        and raw records removed
+    """
+    ensure_dirs(user)
+    cfg = read_config(user)
+    result = {"weekly": 0, "monthly": 0, "late": 0, "dropped": 0}
+    months = int(cfg.get("retention", {}).get("detail_months", 0) or 0)
+    if months <= 0:
+        return result
+
+    cutoff = detail_start(months, today)
+    # Raw days go once their week (Mon-Sun) is complete too
+    drop_before = cutoff - dt.timedelta(days=cutoff.weekday())
+    storage = get_storage(cfg, user)
+    end = (cutoff - dt.timedelta(days=1)).isoformat()
+    if storage.read_logs(end=end).empty:
+        return result
+
+    features = build_features(end=end, user=user)
+    scores = compute_scores(end=end, user=user, features=features)
+    days = features["date"].astype(str)
+    state = load_json(_state_path(user), None)
+    folded = folded_days(user)
+    late = set()
+    for granularity, table in ROLLUP_TABLES.items():
+        new = rollup(features, scores, granularity)
+        new = new[new["period_end"] < cutoff.isoformat()]
+        existing = storage.read_table(table)
+        merged_late = False
+        if not existing.empty:
+            done = existing["date"].astype(str)
+            new = new[~new["date"].isin(done)]
+            if state is not None:
+                # Includes folded days saved again after they were dropped: their
+                # rollup already holds the original, which can't be taken back out
+                counted = folded
+            else:
+                # Written before the state file: the last run kept the days after its last week
+                last_week = storage.read_table(ROLLUP_TABLES["weekly"])["period_end"].astype(str).max()
+                counted = set(days[days > last_week]) if isinstance(last_week, str) else set()
+            starts = pd.to_datetime(days).dt.to_period(PERIODS[granularity]).dt.start_time.dt.strftime("%Y-%m-%d")
+            is_late = starts.isin(done) & ~days.isin(counted)
+            if is_late.any():
+                # Logged after its period was folded: add it to that row instead of losing it
+                picked = set(days[is_late])
+                rows = rollup(features[is_late], scores[scores["date"].astype(str).isin(picked)], granularity)
+                existing = merge_rollups(existing, rows)
+                late |= picked
+                merged_late = True
+        if new.empty and not merged_late:
+            continue
+        merged = new if existing.empty else pd.concat([existing, new], ignore_index=True)
+        storage.write_table(table, merged.sort_values("date").reset_index(drop=True))
+        result[granularity] = len(new)
+    result["late"] = len(late)
+
+    # Every raw day before the cutoff is counted now; record that before any are dropped
+    save_json(_state_path(user), {"folded": sorted(folded | set(days))})
+    result["dropped"] = storage.drop_logs_before(drop_before.isoformat())
+    if result["dropped"]:
+        # The change feed only reports writes; deleted days need a full rebuild
+        reset_feature_watermark(user)
+    return result
+
+
+def score_history(start: str | None = None, user: str | None = None,
+                  granularity: str = "monthly") -> pd.DataFrame:
+    """
+    Scores for trend charts: daily rows inside the detail window, rollup rows before it.
+
+    Args:
+        start: First day to include (YYYY-MM-DD), or None for all history
+        user: Whose shard to read, or None for the single-user layout
+        granularity: Rollup used for the folded part, "weekly" or "monthly"
+
+    Returns:
+        pd.DataFrame: compute_scores columns; rolled-up rows are period averages
+        dated at the period start
+    """
+    from scripts.pipeline import run_stage
+    rollups = get_storage(user=user).read_table(ROLLUP_TABLES[granularity])
+    # Full-history scores come from the stage cache; views are slices of them
+    scores = run_stage("scores", user)
+    if start is not None and not scores.empty:
+        scores = scores[scores["date"].astype(str) >= start].reset_index(drop=True)
+    if rollups.empty:
+        return scores
+
+    # Daily rows begin after the last rolled-up period (earlier raw days are duplicates)
+    boundary = (pd.Timestamp(rollups["period_end"].max()) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    if start is not None:
+        rollups = rollups[rollups["period_end"].astype(str) >= start]
+    daily = scores if scores.empty else scores[scores["date"].astype(str) >= boundary]
+    folded = rollups[["date", *SCORE_COLUMNS]].astype({"date": str})
+    if daily.empty:
+        return folded.reset_index(drop=True)
+    return pd.concat([folded, daily[["date", *SCORE_COLUMNS]]], ignore_index=True)
+
+
+if __name__ == "__main__":
+    print(apply_retention())
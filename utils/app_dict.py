@@ -0,0 +1,85 @@
+# utils/app_dict.py
+from __future__ import annotations
+import os, threading
+from typing import Any, Dict, Iterable, List
+import numpy as np
+import pandas as pd
+import utils.io_utils as io
+
+# Screen-time apps are stored by id: one deployment-wide list of names in
+# data/raw/app_dict.json (id = position in the list), and per day two parallel
+# arrays "app_ids" / "app_mins" in place of the {name: minutes} dict. Ids are
+# only ever appended, so records written earlier stay valid. Entries saved
+# before the dictionary existed keep their dict and are still read.
+
+def app_dict_path() -> str:
+    return os.path.join(io.ROOT, "data", "raw", "app_dict.json")
+
+class AppDictionary:
+    def __init__(self, path: str):
+        self.path = path
+        self._stamp = None
+        self._state: tuple[List[str], Dict[str, int]] = ([], {})
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> tuple[List[str], Dict[str, int]]:
+        # (names, name -> id); treat both as read-only
+        with self._lock:
+            stamp = io._file_stamp(self.path)
+            if stamp != self._stamp:
+                names = io.load_json(self.path, {"apps": []})["apps"]
+                self._state = (names, {n: i for i, n in enumerate(names)})
+                self._stamp = stamp
+            return self._state
+
+    def register(self, names: Iterable[str]) -> Dict[str, int]:
+        """Give every name an id (adding unseen ones to the file); returns name -> id."""
+        wanted = list(dict.fromkeys(names))
+        ids = self.snapshot()[1]
+        if all(n in ids for n in wanted):
+            return ids
+        with io.file_lock(self.path):
+            apps = io.load_json(self.path, {"apps": []})["apps"]
+            known = set(apps)
+            apps.extend(n for n in wanted if n not in known)
+            io.save_json(self.path, {"apps": apps})
+        return self.snapshot()[1]
+
+_dicts: Dict[str, AppDictionary] = {}
+
+def app_dictionary() -> AppDictionary:
+    path = app_dict_path()
+    if path not in _dicts:
+        _dicts[path] = AppDictionary(path)
+    return _dicts[path]
+
+def encode_app_usage(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copies of entries with app_minutes replaced by app_ids/app_mins (others untouched)."""
+    usage = [e["app_minutes"] for e in entries if isinstance(e.get("app_minutes"), dict)]
+    if not usage:
+        return entries
+    ids = app_dictionary().register(a for u in usage for a in u)
+    out = []
+    for entry in entries:
+        apps = entry.get("app_minutes")
+        if isinstance(apps, dict):
+            entry = {k: v for k, v in entry.items() if k != "app_minutes"}
+            entry["app_ids"] = [ids[a] for a in apps]
+            entry["app_mins"] = [float(m) for m in apps.values()]
+        out.append(entry)
+    return out
+
+def decode_app_minutes(logs: pd.DataFrame) -> pd.Series:
+    """Back to one {name: minutes} dict per row, for display.
+
+    Old dict-form rows are mapped without writing the dictionary file.
+    """
+    from utils.child_tables import app_usage_table  # child_tables imports this module
+    index = dict(app_dictionary().snapshot()[1])
+    # Row positions as the "date" key, so days logged twice stay apart
+    usage = app_usage_table(logs.assign(date=np.arange(len(logs))), index)
+    names = list(index)
+    out: List[Dict[str, float]] = [{} for _ in range(len(logs))]
+    for row, app, mins in zip(usage["date"], usage["app_id"], usage["minutes"]):
+        out[row][names[app]] = mins
+    return pd.Series(out, index=logs.index, dtype=object)
@@ -0,0 +1,221 @@
+# utils/binary_store.py
+from __future__ import annotations
+import os
+from datetime import date
+from typing import Any, Dict, Iterator, List
+import numpy as np
+import pandas as pd
+import utils.io_utils as io
+from utils.app_dict import encode_app_usage
+
+# Fixed-width daily records: the numeric part of every log entry lives in one
+# memory-mapped file of NumPy structured records, record i = day (base + i).
+# Everything else (quran_recs, app_minutes, bedtime, ...) goes to a JSONL side
+# store keyed by date, so the numeric columns are read without any parsing.
+
+PRAYERS = ["Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"]
+OUTCOMES = ["clarity", "focus", "calm", "productivity"]
+
+RECORD_DTYPE = np.dtype([
+    ("present", "u1"),
+    *[(p, "u1") for p in PRAYERS],
+    ("dhikr_reps", "<i4"),
+    ("sadaqah_amount", "<f8"),
+    ("sleep_hours", "<f8"),
+    ("other_good", "<i2"),
+    ("other_bad", "<i2"),
+    # Outcomes are 1..5; 0 means "not recorded"
+    *[(o, "i1") for o in OUTCOMES],
+])
+
+NUMERIC_FIELDS = [n for n in RECORD_DTYPE.names if n != "present"]
+
+def binary_dir(user: str | None = None) -> str:
+    return os.path.join(io.user_root(user), "data", "raw", "binary")
+
+class BinaryDayStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.records_path = os.path.join(directory, "daily_numeric.bin")
+        self.meta_path = os.path.join(directory, "daily_numeric.json")
+        self.extras_path = os.path.join(directory, "daily_extras.jsonl")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.meta_path)
+
+    def _base(self) -> int | None:
+        return io.load_json(self.meta_path, {}).get("base_ordinal")
+
+    def _count(self) -> int:
+        return io._file_stamp(self.records_path)[1] // RECORD_DTYPE.itemsize
+
+    def _open(self, mode: str = "r") -> np.ndarray | None:
+        n = self._count()
+        if n == 0:
+            return None
+        return np.memmap(self.records_path, dtype=RECORD_DTYPE, mode=mode, shape=(n,))
+
+    @staticmethod
+    def _ordinal(key: str) -> int:
+        return date.fromisoformat(key).toordinal()
+
+    def _pack(self, entry: Dict[str, Any]) -> np.void:
+        rec = np.zeros((), dtype=RECORD_DTYPE)
+        rec["present"] = 1
+        for name in NUMERIC_FIELDS:
+            v = entry.get(name)
+            if v is None:
+                continue
+            rec[name] = bool(v) if name in PRAYERS else v
+        return rec
+
+    def upsert(self, entries: List[Dict[str, Any]]):
+        if not entries:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with io.file_lock(self.records_path):
+            keys = [io.log_date_key(e) for e in entries]
+            ordinals = [self._ordinal(k) for k in keys]
+            base, n = self._base(), self._count()
+            lo = min(ordinals) if base is None else min(base, min(ordinals))
+            if base is not None and lo < base:
+                # Back-fill before the first day: shift the file so record 0 is the new base
+                with open(self.records_path, "rb") as f:
+                    old = f.read()
+                tmp = self.records_path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(b"\0" * ((base - lo) * RECORD_DTYPE.itemsize))
+                    f.write(old)
+                os.replace(tmp, self.records_path)
+                n += base - lo
+            if base != lo:
+                io.save_json(self.meta_path, {"base_ordinal": lo, "dtype": RECORD_DTYPE.descr})
+            need = max(ordinals) - lo + 1
+            if need > n:
+                with open(self.records_path, "ab") as f:
+                    f.truncate((need) * RECORD_DTYPE.itemsize)
+            recs = self._open("r+")
+            for entry, o in zip(entries, ordinals):
+                recs[o - lo] = self._pack(entry)
+            recs.flush()
+            del recs
+        # Variable-length fields keep upsert-by-date semantics through the log index
+        extras = [{k: v for k, v in e.items() if k not in NUMERIC_FIELDS} for e in entries]
+        for e, k in zip(extras, keys):
+            e["date"] = k
+        io.daily_log_index(self.extras_path, legacy="").upsert(extras)
+
+    def read_df(self, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        if not self.exists():
+            return pd.DataFrame()
+        # A back-fill rewrites the file and its base together; map and read the base
+        # under the same lock so record 0 is the day the base says it is
+        with io.file_lock(self.records_path):
+            recs, base = self._open("r"), self._base()
+        if recs is None or base is None:
+            return pd.DataFrame()
+        lo = 0 if start is None else max(0, self._ordinal(start) - base)
+        hi = len(recs) if end is None else min(len(recs), self._ordinal(end) - base + 1)
+        if hi <= lo:
+            return pd.DataFrame()
+        window = recs[lo:hi]
+        present = np.flatnonzero(window["present"])
+        if present.size == 0:
+            return pd.DataFrame()
+        rows = window[present]
+        days = (np.datetime64("0001-01-01") + (present + lo + base - 1).astype("timedelta64[D]"))
+        df = pd.DataFrame({"date": np.datetime_as_string(days, unit="D").astype(object)})
+        for name in NUMERIC_FIELDS:
+            col = rows[name]
+            if name in PRAYERS:
+                df[name] = col.astype(bool)
+            elif name in OUTCOMES:
+                df[name] = col.astype("int64") if (col > 0).all() else np.where(col > 0, col, np.nan)
+            else:
+                df[name] = col.astype("float64" if col.dtype.kind == "f" else "int64")
+        extras = io.log_index_frame(io.daily_log_index(self.extras_path, legacy=""))
+        if not extras.empty:
+            extras = io._filter_dates(extras, start, end)
+            df = df.merge(extras, on="date", how="left")
+        return df
+
+    def compact(self) -> tuple[int, int]:
+        return io.compact_daily_logs(io.daily_log_index(self.extras_path, legacy=""))
+
+    def drop_before(self, day: str) -> int:
+        """Move the base past day's predecessors, rewriting the file without them."""
+        dropped = 0
+        with io.file_lock(self.records_path):
+            base, recs = self._base(), self._open("r")
+            cut = 0 if base is None or recs is None else min(len(recs), self._ordinal(day) - base)
+            if cut > 0:
+                dropped = int(np.count_nonzero(recs["present"][:cut]))
+                tmp = self.records_path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(recs[cut:].tobytes())
+                del recs
+                os.replace(tmp, self.records_path)
+                io.save_json(self.meta_path, {"base_ordinal": base + cut, "dtype": RECORD_DTYPE.descr})
+        io.compact_daily_logs(io.daily_log_index(self.extras_path, legacy=""), drop_before=day)
+        return dropped
+
+_stores: Dict[str, BinaryDayStore] = {}
+
+def binary_store(user: str | None = None) -> BinaryDayStore:
+    d = binary_dir(user)
+    if d not in _stores:
+        _stores[d] = BinaryDayStore(d)
+    return _stores[d]
+
+class BinaryStorage(io.FileStorage):
+    """File backend with numeric day fields in a memory-mapped fixed-width file."""
+
+    def upsert_logs(self, entries: List[Dict[str, Any]]):
+        binary_store(self.user).upsert(encode_app_usage(entries))
+
+    def read_logs(self, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        return binary_store(self.user).read_df(start, end)
+
+    def iter_logs(self, start: str | None = None, end: str | None = None,
+                  batch_days: int = io.DEFAULT_BATCH_DAYS) -> Iterator[pd.DataFrame]:
+        # Windows of batch_days calendar days over the memory-mapped records
+        # (the variable-length extras still come from their in-memory day index)
+        store = binary_store(self.user)
+        base, count = store._base(), store._count()
+        if base is None or not count:
+            return
+        lo = base if start is None else max(base, store._ordinal(start))
+        hi = base + count - 1 if end is None else min(base + count - 1, store._ordinal(end))
+        while lo <= hi:
+            upto = min(hi, lo + batch_days - 1)
+            df = store.read_df(date.fromordinal(lo).isoformat(), date.fromordinal(upto).isoformat())
+            lo = upto + 1
+            if not df.empty:
+                batch_days = (yield df) or batch_days
+
+    def compact_logs(self) -> tuple[int, int]:
+        return binary_store(self.user).compact()
+
+    def drop_logs_before(self, day: str) -> int:
+        return binary_store(self.user).drop_before(day)
+
+    def changes_since(self, token: Any) -> tuple[List[str] | None, Any]:
+        # Every upsert also appends the day to the extras journal
+        return io.journal_changes(binary_store(self.user).extras_path, token)
+
+    def log_fingerprint(self) -> Any:
+        store = binary_store(self.user)
+        return [self.changes_since(None)[1], list(io._file_stamp(store.records_path)),
+                list(io._file_stamp(store.meta_path))]
+
+def migrate_to_binary(user: str | None = None) -> int:
+    """Copy the current file-backed logs (journal and/or segments) into the binary store."""
+    logs = io.daily_logs_df(user=user)
+    if logs.empty:
+        return 0
+    entries = [
+        {k: v for k, v in rec.items() if not (isinstance(v, float) and np.isnan(v))}
+        for rec in logs.to_dict("records")
+    ]
+    binary_store(user).upsert(entries)
+    return len(entries)
@@ -0,0 +1,127 @@
+# utils/child_tables.py
+from __future__ import annotations
+from itertools import chain
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+from data.reference.surah_meta import NAME_TO_NUMBER
+from utils.app_dict import app_dictionary
+
+# The nested per-day lists as flat child tables keyed by date:
+#   recitations(date, surah_id:int16, ayahs:int16)   surah_id 0 = name not in SURAHS
+#   app_usage(date, app_id:int32, minutes:float64)   app_id from utils.app_dict
+# SQLite keeps them as real tables; the file backends derive them from the
+# log records on read (the records still hold the surah names as typed).
+
+RECITATIONS_COLUMNS = {"date": object, "surah_id": "int16", "ayahs": "int16"}
+# float64: minutes come from a 0.01-step input, and per-day sums must match exactly
+APP_USAGE_COLUMNS = {"date": object, "app_id": "int32", "minutes": "float64"}
+
+_SURAH_LOOKUP = {name.lower(): num for name, num in NAME_TO_NUMBER.items()}
+
+def surah_id(name: Any) -> int:
+    text = str(name or "").strip()
+    if text.isdigit() and 1 <= int(text) <= 114:
+        return int(text)
+    return NAME_TO_NUMBER.get(text) or _SURAH_LOOKUP.get(text.lower(), 0)
+
+def _frame(columns: Dict[str, Any], data: Dict[str, Any]) -> pd.DataFrame:
+    return pd.DataFrame({c: np.asarray(data[c], dtype=t) for c, t in columns.items()})
+
+def _items(value) -> list:
+    # A day's nested list as explode() would see it: lists/tuples/arrays unpack, anything else is one item
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return list(value)
+    return [value]
+
+def recitations_table(logs: pd.DataFrame) -> pd.DataFrame:
+    dates = logs["date"].to_numpy(dtype=object)
+    if "quran_recs" not in logs:
+        return _frame(RECITATIONS_COLUMNS, {c: [] for c in RECITATIONS_COLUMNS})
+    # One row per {surah, ayahs} dict; flattened with list operations, which stay
+    # cheap for a handful of days as well as for millions
+    per_day = [[x for x in _items(v) if type(x) is dict] for v in logs["quran_recs"].to_numpy(dtype=object)]
+    items = list(chain.from_iterable(per_day))
+    rows = np.repeat(np.arange(len(per_day)), [len(v) for v in per_day])
+    names = [x.get("surah") for x in items]
+    ids = {name: surah_id(name) for name in set(names)}
+    ayahs = np.array([x.get("ayahs") for x in items], dtype=object)
+    return _frame(RECITATIONS_COLUMNS, {
+        "date": dates[rows],
+        "surah_id": [ids[name] for name in names],
+        "ayahs": np.where(pd.isna(ayahs), 0, ayahs).astype(int),
+    })
+
+def app_usage_table(logs: pd.DataFrame, index: Dict[str, int] | None = None) -> pd.DataFrame:
+    # index (name -> id): map dict-form rows with it, giving unknown names the next
+    # free ids in place, instead of registering them in the app dictionary file
+    dates = logs["date"].to_numpy(dtype=object)
+    rows, ids, minutes = [], [], []
+    if "app_ids" in logs:
+        # Parallel id/minute arrays, kept in each day's order
+        id_col = logs["app_ids"].to_numpy(dtype=object)
+        min_col = logs["app_mins"].to_numpy(dtype=object)
+        keep = [i for i, v in enumerate(id_col) if type(v) is list]
+        lengths = [len(id_col[i]) for i in keep]
+        if lengths != [len(_items(min_col[i])) for i in keep]:
+            raise ValueError("app_ids and app_mins must have matching element counts")
+        enc_ids = np.array(list(chain.from_iterable(id_col[i] for i in keep)), dtype=object)
+        enc_mins = np.array(list(chain.from_iterable(_items(min_col[i]) for i in keep)), dtype=object)
+        ok = ~(pd.isna(enc_ids) | pd.isna(enc_mins))
+        rows.append(np.repeat(np.asarray(keep, dtype=np.int64), lengths)[ok])
+        ids.append(enc_ids[ok].astype(np.int32))
+        minutes.append(enc_mins[ok].astype(np.float64))
+    if "app_minutes" in logs:
+        # Entries saved before the app dictionary: {name: minutes} dicts
+        old = [(i, name, m) for i, v in enumerate(logs["app_minutes"].to_numpy(dtype=object))
+               if type(v) is dict for name, m in v.items() if not pd.isna(m)]
+        if old:
+            names = [name for _, name, _ in old]
+            if index is None:
+                index = app_dictionary().register(dict.fromkeys(names))
+            else:
+                for name in dict.fromkeys(names):
+                    index.setdefault(name, len(index))
+            rows.append(np.array([i for i, _, _ in old], dtype=np.int64))
+            ids.append(np.array([index[name] for name in names], dtype=np.int32))
+            minutes.append(np.array([m for _, _, m in old], dtype=np.float64))
+    if not rows:
+        return _frame(APP_USAGE_COLUMNS, {c: [] for c in APP_USAGE_COLUMNS})
+    row = np.concatenate(rows)
+    order = np.argsort(row, kind="stable")
+    return _frame(APP_USAGE_COLUMNS, {
+        "date": dates[row[order]],
+        "app_id": np.concatenate(ids)[order],
+        "minutes": np.concatenate(minutes)[order],
+    })
+
+def child_tables(logs: pd.DataFrame, index: Dict[str, int] | None = None) -> Dict[str, pd.DataFrame]:
+    if logs.empty:
+        return {"recitations": _frame(RECITATIONS_COLUMNS, {c: [] for c in RECITATIONS_COLUMNS}),
+                "app_usage": _frame(APP_USAGE_COLUMNS, {c: [] for c in APP_USAGE_COLUMNS})}
+    return {"recitations": recitations_table(logs), "app_usage": app_usage_table(logs, index)}
+
+def child_rows(entries: List[Dict[str, Any]], date_key) -> tuple[list, list]:
+    """(recitation rows, app usage rows) for entries already passed through encode_app_usage."""
+    recs, usage = [], []
+    for e in entries:
+        day = date_key(e)
+        for x in e.get("quran_recs") or []:
+            recs.append((day, surah_id(x.get("surah")), int(x.get("ayahs", 0))))
+        usage.extend((day, int(a), float(m)) for a, m in zip(e.get("app_ids") or [], e.get("app_mins") or []))
+    return recs, usage
+
+def sum_by_date(table: pd.DataFrame, column: str, dates: pd.Series | pd.Index,
+                where: np.ndarray | None = None) -> np.ndarray:
+    """Per-date total of table[column], aligned to dates (unique days; 0 where no rows).
+
+    Accumulates in table order, so totals match summing each day's items in turn.
+    dates may be a prebuilt pd.Index when several tables are summed over the same
+    days; where (a boolean mask over table's rows) restricts the rows summed.
+    """
+    days = dates if isinstance(dates, pd.Index) else pd.Index(dates.to_numpy())
+    pos = days.get_indexer(table["date"].to_numpy())
+    keep = pos >= 0 if where is None else (pos >= 0) & where
+    # bincount gives int64 zeros when there are no rows at all; keep the dtype stable
+    return np.bincount(pos[keep], weights=table[column].to_numpy(dtype=np.float64)[keep],
+                       minlength=len(days)).astype(np.float64, copy=False)
@@ -0,0 +1,93 @@
+# utils/columnar.py
+from __future__ import annotations
+import glob, json, os, tempfile, time
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+
+# Columnar snapshots: one .npy per column plus manifest.json, loadable with mmap_mode.
+# Object columns are stored as fixed-width unicode with a separate null mask.
+
+MANIFEST = "manifest.json"
+
+def _encode_column(col: pd.Series) -> tuple[np.ndarray, np.ndarray | None, str] | None:
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        col = col.astype(object)
+    if col.dtype != object:
+        arr = col.to_numpy()
+        if arr.dtype.kind not in "biufcmM":
+            return None
+        return arr, None, "native"
+    kind = pd.api.types.infer_dtype(col, skipna=True)
+    nulls = col.isna().to_numpy()
+    if kind in ("string", "empty"):
+        arr = np.asarray(col.where(~nulls, "").astype(str).to_numpy(), dtype=str)
+        return arr, nulls, "str"
+    if kind in ("integer", "floating", "mixed-integer-float", "decimal"):
+        return pd.to_numeric(col).to_numpy(dtype="float64"), None, "native"
+    return None
+
+def save_df_snapshot(df: pd.DataFrame, directory: str, meta: Dict[str, Any] | None = None) -> bool:
+    """Write df as a columnar snapshot; returns False if a column can't be stored."""
+    encoded = []
+    for name in df.columns:
+        enc = _encode_column(df[name])
+        if enc is None:
+            return False
+        encoded.append((str(name), *enc))
+    os.makedirs(directory, exist_ok=True)
+    # New files get a fresh generation suffix; the manifest swap is the commit point
+    gen = f"{time.time_ns():x}"
+    columns: List[Dict[str, Any]] = []
+    for i, (name, arr, nulls, kind) in enumerate(encoded):
+        entry = {"name": name, "kind": kind, "file": f"c{i}.{gen}.npy", "dtype": arr.dtype.str}
+        np.save(os.path.join(directory, entry["file"]), arr, allow_pickle=False)
+        if nulls is not None:
+            entry["nulls"] = f"c{i}.{gen}.null.npy"
+            np.save(os.path.join(directory, entry["nulls"]), nulls, allow_pickle=False)
+        columns.append(entry)
+    manifest = {"rows": int(len(df)), "columns": columns, **(meta or {})}
+    # Unique temp name: two writers of the same table must not share one
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=MANIFEST + ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+    _sweep(directory, gen)
+    return True
+
+def _sweep(directory: str, gen: str):
+    # Remove column files of generations older than gen (newer ones may belong to a
+    # save still in progress). A file still memory-mapped by a loaded frame can't be
+    # removed on Windows; it is retried by the next save.
+    for old in glob.glob(os.path.join(directory, "c*.npy")):
+        old_gen = os.path.basename(old).split(".")[1]
+        if len(old_gen) < len(gen) or (len(old_gen) == len(gen) and old_gen < gen):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+def read_manifest(directory: str) -> Dict[str, Any] | None:
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_df_snapshot(directory: str, mmap: bool = True) -> pd.DataFrame | None:
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    mode = "r" if mmap else None
+    data = {}
+    for c in manifest["columns"]:
+        arr = np.load(os.path.join(directory, c["file"]), mmap_mode=mode, allow_pickle=False)
+        if c["kind"] == "str":
+            values = arr.astype(object)
+            if "nulls" in c:
+                nulls = np.load(os.path.join(directory, c["nulls"]), allow_pickle=False)
+                values[nulls] = None
+            data[c["name"]] = values
+        else:
+            data[c["name"]] = arr
+    return pd.DataFrame(data, copy=False) if data else pd.DataFrame(index=range(manifest["rows"]))
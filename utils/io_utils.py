@@ -1,57 +1,1283 @@
-
- # utils/io_utils.py
-from __future__ import annotations
-import json, os
-from typing import Any, Dict, List
-import pandas as pd
-
-ROOT = r"C:\Users\muzam\OneDrive\Desktop\PROJECTS\Passion Projects\BarakahBoost"
-
-def ensure_dirs():
-    for rel in [
-    "data/raw", "data/raw/screen_time", "data/processed", "models",
-    "config", "data/reference"
-    ]:
-        os.makedirs(os.path.join(ROOT, rel), exist_ok=True)
-
-def load_json(path: str, default: Any):
-    if not os.path.exists(path):
-        return default
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def save_json(path: str, data: Any):
- os.makedirs(os.path.dirname(path), exist_ok=True)
- with open(path, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-
-def append_daily_log(entry: Dict[str, Any], path: str):
- data = load_json(path, [])
- data.append(entry)
- save_json(path, data)
-
-def read_config()-> Dict[str, Any]:
- cfg_path = os.path.join(ROOT, "config", "config.json")
- return load_json(cfg_path, {})
-
-def write_config(new_cfg: Dict[str, Any]):
- cfg_path = os.path.join(ROOT, "config", "config.json")
- save_json(cfg_path, new_cfg)
-
-def daily_logs_df()-> pd.DataFrame:
- path = os.path.join(ROOT, "data", "raw", "daily_logs.json")
- logs = load_json(path, [])
- if not logs:
-    return pd.DataFrame()
- return pd.DataFrame(logs)
-
-def save_df_csv(df: pd.DataFrame, rel_path: str):
- path = os.path.join(ROOT, rel_path)
- os.makedirs(os.path.dirname(path), exist_ok=True)
- df.to_csv(path, index=False)
-
-def list_screen_time_files()-> List[str]:
- d = os.path.join(ROOT, "data", "raw", "screen_time")
- if not os.path.exists(d):
-    return []
- return [os.path.join(d, f) for f in os.listdir(d) if f.lower().endswith((".json", ".csv"))]
\ No newline at end of file
+
+ # utils/io_utils.py
+from __future__ import annotations
+import atexit, copy, gzip, hashlib, json, os, queue, re, shutil, tempfile, threading, time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+import pandas as pd
+try:
+    import fcntl
+except ImportError:  # Windows: writers are still serialised within the process
+    fcntl = None
+try:
+    import orjson  # optional, much faster JSON encode/decode
+except ImportError:
+    orjson = None
+from utils.columnar import save_df_snapshot, load_df_snapshot, read_manifest
+
+ROOT = r"C:\Users\muzam\OneDrive\Desktop\PROJECTS\Passion Projects\BarakahBoost"
+
+# fsync the journal after this many appends (0 = leave it to the OS)
+JOURNAL_FSYNC_EVERY = 1
+
+# Budget for parsed files/frames kept in memory between Streamlit reruns
+FILE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Per-user shards opened at once (each holds its own indexes and writer)
+MAX_OPEN_SHARDS = 64
+
+_USER_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+def user_root(user: str | None = None) -> str:
+    # None is the original single-user layout directly under ROOT
+    if user is None:
+        return ROOT
+    if not _USER_ID.match(user) or user in (".", ".."):
+        raise ValueError(f"Invalid user id: {user!r}")
+    return os.path.join(ROOT, "users", user)
+
+def ensure_dirs(user: str | None = None):
+    base = user_root(user)
+    for rel in [
+    "data/raw", "data/raw/screen_time", "data/processed", "models",
+    "config", "data/reference"
+    ]:
+        os.makedirs(os.path.join(base, rel), exist_ok=True)
+
+def _file_stamp(path: str) -> tuple:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return (0, 0)
+    return (st.st_mtime_ns, st.st_size)
+
+class FileCache:
+    """Process-wide LRU of parsed files, validated by (st_mtime_ns, st_size).
+
+    Entries are dropped least-recently-used first once their estimated size
+    exceeds max_bytes. Callers always get a copy, never the cached object.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple, paths: List[str], loader: Callable[[], Any],
+            sizer: Callable[[Any], int]) -> Any:
+        stamp = tuple(_file_stamp(p) for p in paths)
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and hit[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+            self.misses += 1
+        value = loader()
+        nbytes = int(sizer(value))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            if nbytes <= self.max_bytes:
+                self._entries[key] = (stamp, value, nbytes)
+                self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, _, size) = self._entries.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+FILE_CACHE = FileCache(FILE_CACHE_MAX_BYTES)
+
+def cache_stats() -> Dict[str, int]:
+    return FILE_CACHE.stats()
+
+# --- Serialization codecs ---
+
+class JsonCodec:
+    """JSON to/from UTF-8 bytes; uses orjson when installed, stdlib json otherwise."""
+
+    def __init__(self, indent: int | None = None):
+        self.indent = indent
+
+    def encode(self, obj: Any) -> bytes:
+        if orjson is not None:
+            opts = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            # orjson only knows one indent width
+            if self.indent:
+                opts |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, option=opts)
+        if self.indent:
+            return json.dumps(obj, ensure_ascii=False, indent=self.indent).encode("utf-8")
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: bytes | str) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+# Data files are compact; only human-edited config is indented
+COMPACT_JSON = JsonCodec()
+PRETTY_JSON = JsonCodec(indent=2)
+
+def _read_json_file(path: str) -> Any:
+    with open(path, "rb") as f:
+        return COMPACT_JSON.decode(f.read())
+
+def load_json(path: str, default: Any):
+    if not os.path.exists(path):
+        return default
+    data = FILE_CACHE.get(("json", path), [path], lambda: _read_json_file(path),
+                          lambda _: os.path.getsize(path))
+    # Callers (e.g. the settings page) mutate what they get back
+    return copy.deepcopy(data)
+
+def temp_path(path: str) -> str:
+    # Fresh sibling of path for a write-then-replace; unique per call, so threads and
+    # processes writing the same file never share one
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    return tmp
+
+def save_json(path: str, data: Any, codec: JsonCodec | None = None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = (codec or COMPACT_JSON).encode(data)
+    tmp = temp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+def legacy_log_path(user: str | None = None) -> str:
+    return os.path.join(user_root(user), "data", "raw", "daily_logs.json")
+
+def journal_log_path(user: str | None = None) -> str:
+    return os.path.join(user_root(user), "data", "raw", "daily_logs.jsonl")
+
+# --- Append-only journal (one JSON object per line) ---
+
+_journal_unsynced: Dict[str, int] = {}
+
+def _jsonl_line(entry: Dict[str, Any]) -> str:
+    return COMPACT_JSON.encode(entry).decode("utf-8") + "\n"
+
+def _open_log(path: str, mode: str):
+    # Archived segments are gzip; appends to them add a new gzip member
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def append_jsonl(path: str, entries: Iterable[Dict[str, Any]], fsync_every: int | None = None):
+    # Cost is one appended line per entry, independent of the journal size
+    if fsync_every is None:
+        fsync_every = JOURNAL_FSYNC_EVERY
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _open_log(path, "a") as f:
+        n = 0
+        for entry in entries:
+            f.write(_jsonl_line(entry))
+            n += 1
+        f.flush()
+        pending = _journal_unsynced.get(path, 0) + n
+        if fsync_every and pending >= fsync_every:
+            os.fsync(f.fileno())
+            pending = 0
+        _journal_unsynced[path] = pending
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return
+    with _open_log(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield COMPACT_JSON.decode(line)
+            except ValueError:
+                # A torn final line from an interrupted append; nothing follows it
+                if f.readline():
+                    raise
+                return
+
+def _line_boundary(path: str, size: int) -> int:
+    # Offset just past the last complete line (an append may be in progress)
+    if not size or path.endswith(".gz"):
+        return size
+    with open(path, "rb") as f:
+        f.seek(max(0, size - 65536))
+        tail = f.read(size - max(0, size - 65536))
+    return size - len(tail) + tail.rfind(b"\n") + 1
+
+def journal_changes(path: str, token: list | None) -> tuple[List[str] | None, list]:
+    """Days written to a journal since token ([inode, offset]); returns (days, new token).
+
+    days is None when there is no token or the journal was rewritten since
+    (compaction, retention); callers then fall back to a full read.
+    """
+    try:
+        st = os.stat(path)
+        ino, size = st.st_ino, st.st_size
+    except FileNotFoundError:
+        ino, size = 0, 0
+    # Inode 0 in the token: the journal didn't exist yet, so all of it is new
+    if token is None or token[0] not in (0, ino) or (token[0] == ino and size < token[1]):
+        return None, [ino, _line_boundary(path, size)]
+    start = token[1] if token[0] == ino else 0
+    if start == size:
+        return [], [ino, size]
+    if path.endswith(".gz"):
+        # Appended gzip members can't be read from a byte offset
+        return None, [ino, size]
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(size - start)
+    end = data.rfind(b"\n") + 1
+    days = [log_date_key(COMPACT_JSON.decode(line)) for line in data[:end].splitlines() if line.strip()]
+    return days, [ino, start + end]
+
+def iter_journal_days(path: str, start: str | None = None,
+                      end: str | None = None) -> Iterator[Dict[str, Any]]:
+    """Latest record per day of one journal in date order, for days in [start, end].
+
+    Only each day's byte offset is held in memory: a first pass finds the last
+    line per day, a second reads those lines back in date order.
+    """
+    if not os.path.exists(path):
+        return
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        offsets: Dict[str, int] = {}
+        pos = 0
+        for line in f:
+            at, pos = pos, pos + len(line)
+            if not line.strip():
+                continue
+            try:
+                key = log_date_key(COMPACT_JSON.decode(line))
+            except ValueError:
+                # A torn final line from an interrupted append; nothing follows it
+                if f.readline():
+                    raise
+                break
+            if (start is None or key >= start) and (end is None or key <= end):
+                offsets[key] = at
+        for key in sorted(offsets):
+            f.seek(offsets[key])
+            yield COMPACT_JSON.decode(f.readline())
+
+def iter_record_batches(records: Iterable[Dict[str, Any]], batch_days: int) -> Iterator[pd.DataFrame]:
+    # Frames of up to batch_days records; send() a new size to resize the next batches
+    batch: List[Dict[str, Any]] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_days:
+            frame, batch = pd.DataFrame.from_records(batch), []
+            batch_days = (yield frame) or batch_days
+    if batch:
+        yield pd.DataFrame.from_records(batch)
+
+_JSON_WS = " \t\n\r"
+
+def iter_json_array(path: str, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time.
+
+    Memory stays around chunk_size plus the largest element, instead of the
+    several-times-the-file peak of json.load.
+    """
+    if not os.path.exists(path):
+        return
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos, eof = "", 0, False
+        started = False
+
+        def fill() -> bool:
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buf, pos = buf[pos:] + chunk, 0
+            return True
+
+        while True:
+            while pos < len(buf) and buf[pos] in _JSON_WS:
+                pos += 1
+            if pos >= len(buf):
+                if eof or not fill():
+                    if started:
+                        raise ValueError(f"unterminated JSON array in {path}")
+                    return
+                continue
+            ch = buf[pos]
+            if not started:
+                if ch != "[":
+                    raise ValueError(f"expected a JSON array in {path}")
+                started = True
+                pos += 1
+                continue
+            if ch == "]":
+                return
+            if ch == ",":
+                pos += 1
+                continue
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof or not fill():
+                    raise
+                continue
+            # Only trust the value once its delimiter is in the buffer: "1." could be
+            # the start of "1.5e10" cut off at the chunk edge
+            q = end
+            while q < len(buf) and buf[q] in _JSON_WS:
+                q += 1
+            if q >= len(buf) or buf[q] not in ",]":
+                if not eof and fill():
+                    continue
+                if q < len(buf):
+                    raise ValueError(f"malformed JSON array in {path} at offset {q}")
+            yield obj
+            pos = end
+
+def migrate_logs_to_journal(src: str | None = None, dst: str | None = None,
+                            user: str | None = None) -> int:
+    """Convert the legacy JSON array into the journal; returns entries moved."""
+    src = src or legacy_log_path(user)
+    dst = dst or journal_log_path(user)
+    if not os.path.exists(src):
+        return 0
+    if os.path.exists(dst) and os.path.getsize(dst) > 0:
+        raise FileExistsError(f"journal already exists: {dst}")
+    tmp = temp_path(dst)
+    n = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        for entry in iter_json_array(src):
+            f.write(_jsonl_line(entry))
+            n += 1
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, dst)
+    # Keep the original around but out of the read path
+    os.replace(src, src + ".migrated")
+    return n
+
+# --- Cross-process log writes: advisory lock + group commit ---
+
+@contextmanager
+def file_lock(path: str):
+    # Exclusive advisory lock on a sidecar file, so the data file itself can be replaced
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "a") as lf:
+        if fcntl is not None:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
+class GroupCommitLog:
+    """Serialises appends to one log file across threads and processes.
+
+    One thread at a time (the leader) takes the file lock and writes; callers
+    that arrive meanwhile queue up and are written together by the next leader,
+    so N concurrent saves cost far fewer than N lock round-trips and fsyncs.
+    Listeners are called under the lock with (batch, size_before, stamp_after).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.listeners: List[Callable[[List[Dict[str, Any]], int, tuple], None]] = []
+        self._cond = threading.Condition()
+        self._pending: List[Dict[str, Any]] = []
+        self._next_group = 1
+        self._done_group = 0
+        self._errors: Dict[int, BaseException] = {}
+        self._flushing = False
+        self.groups_written = 0
+
+    def commit(self, entries: List[Dict[str, Any]]):
+        """Blocks until entries are on disk (raises if their group failed)."""
+        with self._cond:
+            self._pending.extend(entries)
+            group = self._next_group
+            while self._flushing and self._done_group < group:
+                self._cond.wait()
+            if self._done_group >= group:
+                err = self._errors.get(group)
+                if err is not None:
+                    raise err
+                return
+            # Leader: take everything queued so far as one group
+            batch, self._pending = self._pending, []
+            self._next_group += 1
+            self._flushing = True
+        err = None
+        try:
+            self._write(batch)
+        except BaseException as e:
+            err = e
+        with self._cond:
+            self._done_group = group
+            if err is not None:
+                self._errors[group] = err
+            self._errors.pop(group - 64, None)
+            self._flushing = False
+            self.groups_written += 1
+            self._cond.notify_all()
+        if err is not None:
+            raise err
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        with file_lock(self.path):
+            before = _file_stamp(self.path)[1]
+            if self.path.endswith((".jsonl", ".jsonl.gz")):
+                append_jsonl(self.path, batch)
+            else:
+                # Legacy JSON array: read-modify-write, now safe under the lock
+                data = _read_json_file(self.path) if before else []
+                data.extend(batch)
+                save_json(self.path, data)
+            after = _file_stamp(self.path)
+            for fn in self.listeners:
+                fn(batch, before, after)
+
+_group_logs: Dict[str, GroupCommitLog] = {}
+_group_logs_lock = threading.Lock()
+
+def group_commit_log(path: str) -> GroupCommitLog:
+    with _group_logs_lock:
+        if path not in _group_logs:
+            _group_logs[path] = GroupCommitLog(path)
+        return _group_logs[path]
+
+def append_daily_log(entry: Dict[str, Any], path: str):
+    group_commit_log(path).commit([entry])
+
+def iter_daily_logs(journal: str | None = None, legacy: str | None = None,
+                    user: str | None = None) -> Iterator[Dict[str, Any]]:
+    # Un-migrated legacy entries first, then the journal (later lines win on edits)
+    legacy = legacy_log_path(user) if legacy is None else legacy
+    yield from iter_json_array(legacy)
+    yield from iter_jsonl(journal or journal_log_path(user))
+
+def log_date_key(entry: Dict[str, Any]) -> str:
+    # One record per calendar day; normalise so "2024-1-5" and "2024-01-05" collide
+    raw = str(entry.get("date", ""))
+    try:
+        return datetime.fromisoformat(raw).date().isoformat()
+    except ValueError:
+        return raw
+
+class DailyLogIndex:
+    """date -> latest record for the file-backed logs, kept in date order.
+
+    Saving a day replaces its record in place, so readers get exactly one row per
+    day without sorting or de-duplicating. Superseded journal lines stay on disk
+    until compact_daily_logs() rewrites the journal.
+    """
+
+    def __init__(self, journal: str, legacy: str):
+        self.journal = journal
+        self.legacy = legacy
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.superseded = 0
+        self._stamp = None
+        self._lock = threading.RLock()
+
+    def _current_stamp(self) -> tuple:
+        return (_file_stamp(self.journal), _file_stamp(self.legacy))
+
+    def refresh(self):
+        # Reload only when the files changed behind our back (another process, compaction)
+        stamp = self._current_stamp()
+        if stamp == self._stamp:
+            return
+        records: Dict[str, Dict[str, Any]] = {}
+        superseded = 0
+        for entry in iter_daily_logs(self.journal, self.legacy):
+            key = log_date_key(entry)
+            if key in records:
+                superseded += 1
+            records[key] = entry
+        if list(records) != sorted(records):
+            records = dict(sorted(records.items()))
+        self.records = records
+        self.superseded = superseded
+        self._stamp = stamp
+
+    def upsert(self, entries: List[Dict[str, Any]]):
+        # Several days in one journal append (and at most one fsync)
+        if not entries:
+            return
+        with self._lock:
+            self.refresh()
+        group_commit_log(self.journal).commit(entries)
+
+    def _on_commit(self, batch: List[Dict[str, Any]], before: int, after: tuple):
+        # Called under the journal lock. Apply the batch in place if we were in sync
+        # with the file; if another process appended first, reload on the next read.
+        with self._lock:
+            if self._stamp is None or self._stamp[0][1] != before:
+                self._stamp = None
+                return
+            resort = False
+            for entry in batch:
+                key = log_date_key(entry)
+                if key in self.records:
+                    self.superseded += 1
+                elif self.records and key < next(reversed(self.records)):
+                    # Back-filling an older day: re-establish date order once, at write time
+                    resort = True
+                self.records[key] = entry
+            if resort:
+                self.records = dict(sorted(self.records.items()))
+            self._stamp = (after, _file_stamp(self.legacy))
+
+    def values(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self.refresh()
+            return list(self.records.values())
+
+_log_indexes: Dict[str, DailyLogIndex] = {}
+
+def daily_log_index(journal: str | None = None, legacy: str | None = None,
+                    user: str | None = None) -> DailyLogIndex:
+    # Defaults to the user's journal (+ un-migrated legacy array); segments pass their own
+    journal = journal or journal_log_path(user)
+    if journal not in _log_indexes:
+        index = DailyLogIndex(journal, legacy_log_path(user) if legacy is None else legacy)
+        group_commit_log(journal).listeners.append(index._on_commit)
+        _log_indexes[journal] = index
+    return _log_indexes[journal]
+
+def forget_log_indexes(prefix: str):
+    # Drop the indexes and group-commit logs of files under prefix (a shard being
+    # closed); they are rebuilt from disk if the files are used again
+    with _group_logs_lock:
+        for path in [p for p in _group_logs if p.startswith(prefix)]:
+            del _group_logs[path]
+    for path in [p for p in list(_log_indexes) if p.startswith(prefix)]:
+        _log_indexes.pop(path, None)
+
+def compact_daily_logs(index: DailyLogIndex | None = None, user: str | None = None,
+                       drop_before: str | None = None) -> tuple[int, int]:
+    """Rewrite the journal with one line per day in date order; returns (kept, dropped).
+
+    drop_before (YYYY-MM-DD) also removes every day before it (retention).
+    """
+    index = index or daily_log_index(user=user)
+    # Lock order matches GroupCommitLog: file lock first, then the index
+    with file_lock(index.journal), index._lock:
+        index.refresh()
+        kept = [e for k, e in index.records.items() if drop_before is None or k >= drop_before]
+        dropped = index.superseded + len(index.records) - len(kept)
+        journal = index.journal
+        os.makedirs(os.path.dirname(journal), exist_ok=True)
+        tmp = temp_path(journal)
+        with (gzip.open(tmp, "wt", encoding="utf-8") if journal.endswith(".gz")
+              else open(tmp, "w", encoding="utf-8")) as f:
+            f.writelines(_jsonl_line(e) for e in kept)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, journal)
+        if index.legacy and os.path.exists(index.legacy):
+            os.replace(index.legacy, index.legacy + ".migrated")
+        index._stamp = None
+    return len(kept), dropped
+
+def read_config(user: str | None = None)-> Dict[str, Any]:
+ # A user without their own settings inherits the deployment-wide config
+ cfg_path = os.path.join(user_root(user), "config", "config.json")
+ if user is not None and not os.path.exists(cfg_path):
+  cfg_path = os.path.join(ROOT, "config", "config.json")
+ return load_json(cfg_path, {})
+
+def write_config(new_cfg: Dict[str, Any], user: str | None = None):
+ cfg_path = os.path.join(user_root(user), "config", "config.json")
+ with file_lock(config_history_path(user)):
+  history = config_history(user)
+  # First versioned save: the settings being replaced (inherited ones too) start the history
+  old_path = cfg_path if os.path.exists(cfg_path) or user is None else os.path.join(ROOT, "config", "config.json")
+  if not history and os.path.exists(old_path):
+   _append_config_version(load_json(old_path, {}), user, os.path.getmtime(old_path))
+   history = config_history(user)
+  save_json(cfg_path, new_cfg, codec=PRETTY_JSON)
+  if not history or history[-1]["version"] != config_version(new_cfg):
+   _append_config_version(new_cfg, user)
+
+# --- Config versions ---
+# Every distinct config saved gets a version (hash of its content) and a line in
+# config/history.jsonl: {"version", "saved_at" (UTC ISO time), "config"}, in
+# save order. Derived data keyed by config (scripts.pipeline) can then be
+# recomputed or looked up for any earlier version.
+
+def config_version(cfg: Dict[str, Any]) -> str:
+    """Content hash of a config: same settings, same version, whatever the key order."""
+    canonical = json.dumps(cfg, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+def config_history_path(user: str | None = None) -> str:
+    return os.path.join(user_root(user), "config", "history.jsonl")
+
+def _append_config_version(cfg: Dict[str, Any], user: str | None, saved_at: float | None = None):
+    path = config_history_path(user)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    when = datetime.fromtimestamp(time.time() if saved_at is None else saved_at, timezone.utc)
+    line = {"version": config_version(cfg), "saved_at": when.strftime("%Y-%m-%dT%H:%M:%SZ"), "config": cfg}
+    with open(path, "ab") as f:
+        f.write(COMPACT_JSON.encode(line) + b"\n")
+
+def _read_jsonl_file(path: str) -> List[Any]:
+    with open(path, "rb") as f:
+        return [COMPACT_JSON.decode(line) for line in f if line.strip()]
+
+def config_history(user: str | None = None) -> List[Dict[str, Any]]:
+    """Saved config versions of a profile, oldest first (empty before the first save)."""
+    path = config_history_path(user)
+    if not os.path.exists(path):
+        return []
+    entries = FILE_CACHE.get(("jsonl", path), [path], lambda: _read_jsonl_file(path),
+                             lambda _: os.path.getsize(path))
+    return copy.deepcopy(entries)
+
+def config_for_version(version: str, user: str | None = None) -> Dict[str, Any]:
+    """
+    The settings saved as a given version.
+
+    Args:
+        version: config_version() hash (a unique prefix is enough)
+        user: Whose history to search, or None for the single-user layout
+
+    Returns:
+        dict: The config
+
+    Raises:
+        KeyError: No saved version matches (or the prefix is ambiguous)
+    """
+    matches = {e["version"]: e["config"] for e in config_history(user) if e["version"].startswith(version)}
+    if len(matches) != 1:
+        raise KeyError(f"No unique config version {version!r}")
+    return matches.popitem()[1]
+
+def config_at(when: str, user: str | None = None) -> Dict[str, Any] | None:
+    """The config in effect at an ISO time (UTC), or None if it predates the history."""
+    current = None
+    for entry in config_history(user):
+        if entry["saved_at"].rstrip("Z") > when.rstrip("Z"):
+            break
+        current = entry["config"]
+    return current
+
+def _frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+def log_index_frame(index: DailyLogIndex) -> pd.DataFrame:
+    # Cached, shared frame for one journal: callers must copy before mutating
+    return FILE_CACHE.get(
+        ("daily_logs", index.journal), [index.journal, index.legacy],
+        lambda: pd.DataFrame.from_records(index.values()),
+        # Cell payloads are roughly the size of the journal on disk
+        lambda df: _frame_nbytes(df) + _file_stamp(index.journal)[1],
+    )
+
+def daily_logs_df(start: str | None = None, end: str | None = None,
+                  user: str | None = None)-> pd.DataFrame:
+    # One row per day, already in date order; start/end are inclusive YYYY-MM-DD
+    from utils.segments import segment_store
+    frames = []
+    segments = segment_store(user)
+    if segments.exists():
+        # Only the monthly segments overlapping [start, end] are opened
+        frames.append(segments.read_df(start, end))
+    index = daily_log_index(user=user)
+    if _file_stamp(index.journal)[1] or _file_stamp(index.legacy)[1]:
+        frames.append(_filter_dates(log_index_frame(index), start, end))
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        # build_features mutates the frame it gets; keep the cached one pristine
+        return frames[0].copy()
+    # Journal and segments both present: days saved to the journal after the
+    # segments were cut are the newer ones, so the journal wins per day
+    logs = pd.concat(frames, ignore_index=True)
+    return logs.sort_values("date", kind="stable").drop_duplicates("date", keep="last").reset_index(drop=True)
+
+def frame_digest(df: pd.DataFrame) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode("utf-8"))
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    except TypeError:
+        # Unhashable cells (lists/dicts): fall back to the rendered CSV
+        h.update(df.to_csv(index=False).encode("utf-8"))
+    return h.hexdigest()
+
+def _text_columns(df: pd.DataFrame) -> List[str]:
+    return [str(c) for c, t in df.dtypes.items() if t == object]
+
+def read_csv_table(path: str) -> pd.DataFrame:
+    """A CSV written by save_df_csv / table_writer, with its text columns read back as text.
+
+    The sidecar lists the columns that were text, so their empty cells come back as ""
+    (as written) rather than NaN; empty cells elsewhere are still NaN.
+    """
+    text = load_json(path + ".sha256", {}).get("text")
+    if text is None:
+        return pd.read_csv(path)
+    columns = [str(c) for c in pd.read_csv(path, nrows=0).columns]
+    return pd.read_csv(path, dtype={c: str for c in columns if c in text}, keep_default_na=False,
+                       na_values={c: [""] for c in columns if c not in text})
+
+def save_df_csv(df: pd.DataFrame, rel_path: str, skip_unchanged: bool = True,
+                user: str | None = None, appended: int = 0) -> bool:
+    """Write df under the user's root; returns False when the file already held this frame.
+
+    appended > 0 says only the last `appended` rows are new; if the file holds
+    exactly the rows before them, they are appended instead of rewriting it.
+    """
+    path = os.path.join(user_root(user), rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = frame_digest(df)
+    sidecar = path + ".sha256"
+    if skip_unchanged and os.path.exists(path):
+        # The sidecar records the digest and the CSV's stamp when we last wrote it,
+        # so a hand-edited CSV is still rewritten
+        recorded = load_json(sidecar, {})
+        if tuple(recorded.get("stamp", ())) == _file_stamp(path):
+            if recorded.get("digest") == digest:
+                return False
+            if 0 < appended < len(df) and recorded.get("digest") == frame_digest(df.iloc[:-appended]):
+                # Only the new rows are rendered; they go onto a byte copy of the CSV,
+                # which then replaces it like a full write would
+                tmp = temp_path(path)
+                shutil.copyfile(path, tmp)
+                df.iloc[-appended:].to_csv(tmp, index=False, header=False, mode="a")
+                os.replace(tmp, path)
+                save_json(sidecar, {"digest": digest, "stamp": list(_file_stamp(path)),
+                                    "text": _text_columns(df)})
+                return True
+    # Temp file + rename: readers see the old or the new CSV, never half of one
+    tmp = temp_path(path)
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    save_json(sidecar, {"digest": digest, "stamp": list(_file_stamp(path)), "text": _text_columns(df)})
+    return True
+
+# --- Write-behind queue for "Save Day" ---
+
+# Tries at one batch before its entries are set aside in the storage's failed-logs file
+MAX_WRITE_ATTEMPTS = 5
+
+class BackgroundLogWriter:
+    """Accepts log entries immediately and persists them from a worker thread.
+
+    Entries that pile up while a write is in flight are coalesced (latest per
+    day) into a single upsert_logs() call. A batch that keeps failing is retried
+    entry by entry on its last attempt; entries that still fail are appended to
+    storage.failed_logs_path() and reported by result() and status(), so later
+    saves aren't held up behind them. flush() blocks until everything submitted
+    so far is written or set aside; close() flushes and stops the worker.
+    """
+
+    def __init__(self, storage: "Storage", max_pending: int = 1000,
+                 max_attempts: int = MAX_WRITE_ATTEMPTS):
+        self.storage = storage
+        self.max_attempts = max_attempts
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._cond = threading.Condition()
+        self._submit_lock = threading.Lock()
+        self._submitted = 0
+        self._done = 0
+        self._failed: Dict[int, str] = {}
+        self._last_error: str | None = None
+        self._submit_ms: deque = deque(maxlen=1000)
+        self._write_ms: deque = deque(maxlen=1000)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="barakah-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, entry: Dict[str, Any]) -> int:
+        """Queue an entry; returns its ticket (blocks only if the queue is full)."""
+        t0 = time.perf_counter()
+        if self._closed:
+            raise RuntimeError("log writer is closed")
+        # Tickets enter the queue in ticket order, so the worker's _done (the highest
+        # ticket it has handled) never covers an entry still waiting to be queued
+        with self._submit_lock:
+            with self._cond:
+                self._submitted += 1
+                ticket = self._submitted
+            self._queue.put((ticket, entry))
+        self._submit_ms.append((time.perf_counter() - t0) * 1000.0)
+        return ticket
+
+    def _run(self):
+        retry: List[tuple] = []
+        attempts = 0
+        while True:
+            batch = retry or [self._queue.get()]
+            retry = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            items = [b for b in batch if b is not None]
+            if items:
+                latest: Dict[str, tuple] = {}
+                for ticket, entry in items:
+                    latest[log_date_key(entry)] = (ticket, entry)
+                t0 = time.perf_counter()
+                try:
+                    self.storage.upsert_logs([e for _, e in latest.values()])
+                except Exception as e:
+                    attempts += 1
+                    error = f"{type(e).__name__}: {e}"
+                    if attempts < self.max_attempts:
+                        # Keep the batch and try again; status() surfaces the error
+                        with self._cond:
+                            self._last_error = error
+                            self._cond.notify_all()
+                        retry = items + [b for b in batch if b is None]
+                        time.sleep(0.5 * attempts)
+                        continue
+                    self._give_up(items, latest, error)
+                else:
+                    self._write_ms.append((time.perf_counter() - t0) * 1000.0)
+                    with self._cond:
+                        self._done = max(self._done, max(t for t, _ in items))
+                        self._last_error = None
+                        self._cond.notify_all()
+                attempts = 0
+            if any(b is None for b in batch):
+                return
+
+    def _give_up(self, items: List[tuple], latest: Dict[str, tuple], error: str):
+        # Last attempt: one entry at a time, so a single bad entry can't sink the rest
+        failed: Dict[int, str] = {}
+        for ticket, entry in latest.values():
+            try:
+                self.storage.upsert_logs([entry])
+            except Exception as e:
+                failed[ticket] = f"{type(e).__name__}: {e}"
+        if failed:
+            now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            try:
+                append_jsonl(self.storage.failed_logs_path(), [
+                    {"failed_at": now, "error": failed[t], "entry": e}
+                    for t, e in latest.values() if t in failed
+                ])
+            except Exception as e:
+                error = f"{error}; could not set the entries aside: {type(e).__name__}: {e}"
+        # Superseded entries for the same day share the fate of the one that replaced them
+        outcome = {log_date_key(e): failed.get(t) for t, e in latest.values()}
+        with self._cond:
+            for ticket, entry in items:
+                if outcome[log_date_key(entry)] is not None:
+                    self._failed[ticket] = outcome[log_date_key(entry)]
+            self._done = max(self._done, max(t for t, _ in items))
+            self._last_error = error if failed else None
+            self._cond.notify_all()
+
+    def result(self, ticket: int) -> str:
+        """"pending", "durable", or "failed" (set aside in storage.failed_logs_path())."""
+        with self._cond:
+            if ticket > self._done:
+                return "pending"
+            return "failed" if ticket in self._failed else "durable"
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every entry submitted so far is handled; True if all are durable."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self._submitted
+            while self._done < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return not any(t <= target for t in self._failed)
+
+    def close(self, timeout: float | None = 10.0) -> bool:
+        if self._closed:
+            return True
+        done = self.flush(timeout)
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        return done
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            submitted, done, failed, err = self._submitted, self._done, len(self._failed), self._last_error
+        def p99(samples):
+            return float(sorted(samples)[int(0.99 * (len(samples) - 1))]) if samples else 0.0
+        return {"pending": submitted - done, "durable": done - failed, "failed": failed,
+                "submitted": submitted, "last_error": err,
+                "failed_logs": self.storage.failed_logs_path() if failed else None,
+                "submit_p99_ms": p99(list(self._submit_ms)), "write_p99_ms": p99(list(self._write_ms))}
+
+# One writer per shard, backend and user, however many Storage objects point at it
+_log_writers: Dict[tuple, BackgroundLogWriter] = {}
+_log_writers_lock = threading.Lock()
+
+def _writer_key(storage: "Storage") -> tuple:
+    # user too: one SQLite file can hold several users' rows
+    return (storage.location, type(storage).__name__, getattr(storage, "user", None))
+
+def get_log_writer(storage: "Storage | None" = None) -> BackgroundLogWriter:
+    storage = storage or get_storage()
+    key = _writer_key(storage)
+    with _log_writers_lock:
+        writer = _log_writers.get(key)
+        if writer is None:
+            writer = BackgroundLogWriter(storage)
+            _log_writers[key] = writer
+            atexit.register(writer.close)
+        return writer
+
+def close_log_writer(storage: "Storage") -> bool:
+    """Flush and stop the shard's writer, if it has one; False if entries were left pending."""
+    with _log_writers_lock:
+        writer = _log_writers.pop(_writer_key(storage), None)
+    if writer is None:
+        return True
+    atexit.unregister(writer.close)
+    return writer.close()
+
+def snapshot_dir(csv_path: str) -> str:
+    # data/processed/daily_features.csv -> data/processed/daily_features.cols/
+    return os.path.splitext(csv_path)[0] + ".cols"
+
+# --- Pluggable storage: raw logs plus processed tables ---
+
+PROCESSED_TABLES = ("daily_features", "barakah_scores", "outcomes")
+
+# Days per batch for Storage.iter_logs
+DEFAULT_BATCH_DAYS = 1000
+
+class Storage:
+    """Backend interface for raw logs and the processed per-day tables."""
+
+    # True when read_children comes from stored tables rather than the log records
+    stores_children = False
+
+    @property
+    def location(self) -> str:
+        # Where the shard lives (directory or database file); keys its log writer
+        raise NotImplementedError
+
+    def close(self):
+        # Release in-memory state kept for this shard; it stays usable (state is rebuilt)
+        pass
+
+    def failed_logs_path(self) -> str:
+        # JSONL of entries the background writer gave up on, kept for replay
+        raise NotImplementedError
+
+    def upsert_log(self, entry: Dict[str, Any]):
+        # Saving a day that already exists replaces its record
+        self.upsert_logs([entry])
+
+    def upsert_logs(self, entries: List[Dict[str, Any]]):
+        # Batch form used by the background writer; one durable write per call
+        raise NotImplementedError
+
+    def read_logs(self, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def iter_logs(self, start: str | None = None, end: str | None = None,
+                  batch_days: int = DEFAULT_BATCH_DAYS) -> Iterator[pd.DataFrame]:
+        # The read_logs rows in date-ordered batches of up to batch_days days; send()
+        # a new size to resize later batches. This default reads the range at once,
+        # backends that can stream from disk override it.
+        logs = self.read_logs(start, end)
+        pos = 0
+        while pos < len(logs):
+            batch = logs.iloc[pos:pos + batch_days].reset_index(drop=True)
+            pos += len(batch)
+            batch_days = (yield batch) or batch_days
+
+    def read_children(self, start: str | None = None, end: str | None = None,
+                      logs: pd.DataFrame | None = None) -> Dict[str, pd.DataFrame]:
+        # Flat "recitations" / "app_usage" tables (see utils.child_tables); backends
+        # without stored child tables derive them from logs (read here if not given)
+        from utils.child_tables import child_tables
+        return child_tables(self.read_logs(start, end) if logs is None else logs)
+
+    def compact_logs(self) -> tuple[int, int]:
+        # Offline cleanup of superseded records; returns (kept, dropped)
+        raise NotImplementedError
+
+    def drop_logs_before(self, day: str) -> int:
+        # Retention: permanently remove raw days before day; returns records removed
+        raise NotImplementedError
+
+    def read_days(self, days: List[str]) -> pd.DataFrame:
+        # Just the given days (sorted YYYY-MM-DD); backends with a day index override this
+        if not days:
+            return pd.DataFrame()
+        logs = self.read_logs(days[0], days[-1])
+        if logs.empty:
+            return logs
+        return logs[logs["date"].astype(str).isin(days)].reset_index(drop=True)
+
+    def changes_since(self, token: Any) -> tuple[List[str] | None, Any]:
+        # Change feed for incremental rebuilds: (days written since token, new token).
+        # Days are None when the backend can't tell (or token is None): rebuild fully.
+        return None, None
+
+    def log_fingerprint(self) -> Any:
+        # JSON-able value that changes whenever the stored logs do (saves, compaction,
+        # retention); keys derived results in the stage cache
+        return self.changes_since(None)[1]
+
+    def write_table(self, name: str, df: pd.DataFrame, appended: int = 0):
+        # appended: hint that only the last rows are new (lets backends append)
+        raise NotImplementedError
+
+    @contextmanager
+    def table_writer(self, name: str) -> Iterator[Callable[[pd.DataFrame], None]]:
+        # Replace a table chunk by chunk (in row order): yields write(chunk). This
+        # default collects the chunks and calls write_table once at the end.
+        chunks: List[pd.DataFrame] = []
+        yield chunks.append
+        if chunks:
+            self.write_table(name, pd.concat(chunks, ignore_index=True))
+
+    def read_table(self, name: str, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+class _StreamDigest:
+    """frame_digest of the concatenation of chunks, without holding them.
+
+    Row hashes are per row, so they can be fed chunk by chunk; valid is False
+    when the chunks' dtypes disagree or a chunk isn't hashable.
+    """
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self._dtypes = None
+        self.valid = True
+
+    def update(self, chunk: pd.DataFrame):
+        dtypes = json.dumps([[str(c), str(t)] for c, t in chunk.dtypes.items()])
+        if self._dtypes is None:
+            self._dtypes = dtypes
+            self._hash.update(dtypes.encode("utf-8"))
+        elif dtypes != self._dtypes:
+            self.valid = False
+        if self.valid:
+            try:
+                self._hash.update(pd.util.hash_pandas_object(chunk, index=False).to_numpy().tobytes())
+            except TypeError:
+                self.valid = False
+
+    def hexdigest(self) -> str | None:
+        return self._hash.hexdigest() if self.valid and self._dtypes is not None else None
+
+def _filter_dates(df: pd.DataFrame, start: str | None, end: str | None) -> pd.DataFrame:
+    if df.empty or (start is None and end is None):
+        return df
+    dates = df["date"].astype(str)
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= dates >= start
+    if end is not None:
+        mask &= dates <= end
+    return df[mask].reset_index(drop=True)
+
+class FileStorage(Storage):
+    """JSONL journal for logs, one CSV per processed table (the default layout)."""
+
+    def __init__(self, user: str | None = None):
+        self.user = user
+
+    @property
+    def location(self) -> str:
+        return user_root(self.user)
+
+    def close(self):
+        # Only the shard's own data dir: the default root also holds users/<id>/
+        forget_log_indexes(os.path.join(self.location, "data") + os.sep)
+
+    def failed_logs_path(self) -> str:
+        return os.path.join(self.location, "data", "raw", "failed_logs.jsonl")
+
+    def upsert_logs(self, entries: List[Dict[str, Any]]):
+        from utils.app_dict import encode_app_usage
+        daily_log_index(user=self.user).upsert(encode_app_usage(entries))
+
+    def read_logs(self, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        return daily_logs_df(start, end, user=self.user)
+
+    def compact_logs(self) -> tuple[int, int]:
+        return compact_daily_logs(user=self.user)
+
+    def drop_logs_before(self, day: str) -> int:
+        return compact_daily_logs(user=self.user, drop_before=day)[1]
+
+    def changes_since(self, token: Any) -> tuple[List[str] | None, Any]:
+        return journal_changes(journal_log_path(self.user), token)
+
+    def iter_logs(self, start: str | None = None, end: str | None = None,
+                  batch_days: int = DEFAULT_BATCH_DAYS) -> Iterator[pd.DataFrame]:
+        from utils.segments import segment_store
+        segments = segment_store(self.user)
+        journal = journal_log_path(self.user)
+        if os.path.exists(legacy_log_path(self.user)) or (segments.exists() and _file_stamp(journal)[1]):
+            # Un-migrated array or mid-migration: merged the way read_logs does
+            yield from super().iter_logs(start, end, batch_days)
+            return
+        if segments.exists():
+            records = (rec for month in segments.overlapping(start, end)
+                       for rec in iter_journal_days(
+                           os.path.join(segments.directory, segments.segments()[month]["file"]), start, end))
+        else:
+            records = iter_journal_days(journal, start, end)
+        yield from iter_record_batches(records, batch_days)
+
+    def log_fingerprint(self) -> Any:
+        # read_logs merges the journal, an un-migrated array and monthly segments
+        from utils.segments import segment_store
+        segments = segment_store(self.user)
+        return [journal_changes(journal_log_path(self.user), None)[1],
+                list(_file_stamp(legacy_log_path(self.user))),
+                segments.changes_since(None)[1] if segments.exists() else None]
+
+    def read_days(self, days: List[str]) -> pd.DataFrame:
+        from utils.segments import segment_store
+        if segment_store(self.user).exists():
+            return super().read_days(days)
+        # Straight from the in-memory day index, without rebuilding the full frame
+        index = daily_log_index(user=self.user)
+        with index._lock:
+            index.refresh()
+            records = [index.records[d] for d in days if d in index.records]
+        return pd.DataFrame.from_records(records)
+
+    def write_table(self, name: str, df: pd.DataFrame, appended: int = 0):
+        # CSV is the export; the columnar snapshot next to it is what readers load
+        rel = os.path.join("data", "processed", f"{name}.csv")
+        path = os.path.join(user_root(self.user), rel)
+        written = save_df_csv(df, rel, user=self.user, appended=appended)
+        if written or read_manifest(snapshot_dir(path)) is None:
+            save_df_snapshot(df, snapshot_dir(path), {"csv_stamp": list(_file_stamp(path))})
+
+    @contextmanager
+    def table_writer(self, name: str) -> Iterator[Callable[[pd.DataFrame], None]]:
+        # Chunks are appended to a temp CSV that replaces the table at the end
+        path = os.path.join(user_root(self.user), "data", "processed", f"{name}.csv")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = temp_path(path)
+        digest = _StreamDigest()
+        text: Dict[str, None] = {}
+        f = None
+
+        def write(chunk: pd.DataFrame):
+            nonlocal f
+            header = f is None
+            if header:
+                f = open(tmp, "w", encoding="utf-8", newline="")
+            chunk.to_csv(f, index=False, header=header)
+            digest.update(chunk)
+            text.update(dict.fromkeys(_text_columns(chunk)))
+
+        try:
+            yield write
+        except BaseException:
+            # A failed run leaves the previous table in place
+            if f is not None:
+                f.close()
+            os.remove(tmp)
+            raise
+        if f is None:
+            os.remove(tmp)
+            return
+        f.close()
+        os.replace(tmp, path)
+        # No digest when the chunks can't be hashed as one frame: the next save rewrites the CSV
+        save_json(path + ".sha256", {"digest": digest.hexdigest(), "stamp": list(_file_stamp(path)),
+                                     "text": list(text)})
+        # The columnar snapshot needs whole columns; read_table uses the CSV until the next write_table
+        shutil.rmtree(snapshot_dir(path), ignore_errors=True)
+
+    def read_table(self, name: str, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        path = os.path.join(user_root(self.user), "data", "processed", f"{name}.csv")
+        if not os.path.exists(path) or not os.path.getsize(path):
+            return pd.DataFrame()
+        snap = snapshot_dir(path)
+        manifest = read_manifest(snap)
+        # Only trust the snapshot if the CSV hasn't been rewritten since (e.g. by hand)
+        if manifest is not None and tuple(manifest.get("csv_stamp", ())) == _file_stamp(path):
+            df = load_df_snapshot(snap)
+        else:
+            df = FILE_CACHE.get(("csv", path), [path, path + ".sha256"], lambda: read_csv_table(path),
+                                _frame_nbytes).copy()
+        return _filter_dates(df, start, end)
+
+_storages: OrderedDict = OrderedDict()
+_storages_lock = threading.Lock()
+
+def get_storage(cfg: Dict[str, Any] | None = None, user: str | None = None) -> Storage:
+    # Backend comes from config.json -> "storage" ({"backend": "file" | "segmented" | "binary" | "sqlite"}).
+    # Each user's shard is opened on first use; the least recently used are let go,
+    # after their pending saves are written.
+    st_cfg = (cfg if cfg is not None else read_config(user)).get("storage", {})
+    backend = st_cfg.get("backend", "file")
+    base = user_root(user)
+    key = (backend, base, st_cfg.get("sqlite_path"))
+    with _storages_lock:
+        storage = _storages.get(key)
+        if storage is not None:
+            _storages.move_to_end(key)
+            return storage
+    if backend == "file":
+        storage = FileStorage(user)
+    elif backend == "segmented":
+        from utils.segments import SegmentedStorage
+        storage = SegmentedStorage(user)
+    elif backend == "binary":
+        from utils.binary_store import BinaryStorage
+        storage = BinaryStorage(user)
+    elif backend == "sqlite":
+        from utils.sqlite_store import SQLiteStorage
+        path = os.path.join(base, st_cfg.get("sqlite_path", os.path.join("data", "barakah.db")))
+        storage = SQLiteStorage(path, user=user or st_cfg.get("user", "default"))
+    else:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    evicted = []
+    with _storages_lock:
+        storage = _storages.setdefault(key, storage)
+        while len(_storages) > MAX_OPEN_SHARDS:
+            evicted.append(_storages.popitem(last=False)[1])
+    for old in evicted:
+        close_log_writer(old)
+        old.close()
+    return storage
+
+def list_screen_time_files(user: str | None = None)-> List[str]:
+    d = os.path.join(user_root(user), "data", "raw", "screen_time")
+    if not os.path.exists(d):
+        return []
+    return [os.path.join(d, f) for f in os.listdir(d) if f.lower().endswith((".json", ".csv"))]
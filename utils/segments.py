@@ -0,0 +1,204 @@
+# utils/segments.py
+from __future__ import annotations
+import calendar, gzip, os
+from datetime import date, timedelta
+from typing import Any, Dict, List
+import pandas as pd
+import utils.io_utils as io
+from utils.app_dict import encode_app_usage
+
+# Time-partitioned raw logs: one JSONL segment per month under data/raw/logs/,
+# listed in segments.json with each segment's date bounds so range reads can
+# skip segments that can't contain the requested days. Months older than
+# storage.archive_after_days are gzip-compressed and read back transparently.
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 180
+
+def segment_dir(user: str | None = None) -> str:
+    return os.path.join(io.user_root(user), "data", "raw", "logs")
+
+def month_bounds(month: str) -> tuple[str, str]:
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{month}-01", f"{month}-{calendar.monthrange(year, mon)[1]:02d}"
+
+class SegmentedLogStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "segments.json")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.index_path)
+
+    def segments(self) -> Dict[str, Dict[str, Any]]:
+        return io.load_json(self.index_path, {}).get("segments", {})
+
+    def _segment_index(self, month: str) -> io.DailyLogIndex:
+        seg = self.segments().get(month) or {"file": f"{month}.jsonl"}
+        return io.daily_log_index(os.path.join(self.directory, seg["file"]), legacy="")
+
+    def _register(self, months: List[str]):
+        known = self.segments()
+        if all(m in known for m in months):
+            return
+        with io.file_lock(self.index_path):
+            data = io.load_json(self.index_path, {"segments": {}})
+            for m in months:
+                if m not in data["segments"]:
+                    start, end = month_bounds(m)
+                    data["segments"][m] = {"file": f"{m}.jsonl", "start": start, "end": end}
+            data["segments"] = dict(sorted(data["segments"].items()))
+            io.save_json(self.index_path, data)
+
+    def upsert(self, entries: List[Dict[str, Any]]):
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in entries:
+            by_month.setdefault(io.log_date_key(entry)[:7], []).append(entry)
+        self._register(list(by_month))
+        for month, batch in by_month.items():
+            self._segment_index(month).upsert(batch)
+
+    def overlapping(self, start: str | None = None, end: str | None = None) -> List[str]:
+        return [
+            m for m, seg in sorted(self.segments().items())
+            if (start is None or seg["end"] >= start) and (end is None or seg["start"] <= end)
+        ]
+
+    def read_df(self, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        frames = []
+        for month in self.overlapping(start, end):
+            seg = self.segments()[month]
+            df = io.log_index_frame(self._segment_index(month))
+            # Segments fully inside the range need no row filtering
+            if (start is not None and seg["start"] < start) or (end is not None and seg["end"] > end):
+                df = io._filter_dates(df, start, end)
+            if not df.empty:
+                frames.append(df)
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def archive(self, older_than_days: int, today: date | None = None) -> List[str]:
+        """Gzip every segment that ended more than older_than_days ago; returns the months.
+
+        Meant to run offline (manage_logs archive): a save racing the swap for a
+        month being archived would land in the old plain segment.
+        """
+        cutoff = ((today or date.today()) - timedelta(days=older_than_days)).isoformat()
+        done = []
+        for month, seg in self.segments().items():
+            if seg.get("compressed") or seg["end"] >= cutoff:
+                continue
+            src = os.path.join(self.directory, seg["file"])
+            dst = src + ".gz"
+            with io.file_lock(src):
+                # Compact while compressing: cold months keep one line per day
+                index = self._segment_index(month)
+                tmp = dst + ".tmp"
+                with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                    f.writelines(io._jsonl_line(e) for e in index.values())
+                os.replace(tmp, dst)
+                with io.file_lock(self.index_path):
+                    data = io.load_json(self.index_path, {"segments": {}})
+                    data["segments"][month].update({"file": seg["file"] + ".gz", "compressed": True})
+                    io.save_json(self.index_path, data)
+                os.remove(src)
+            io._log_indexes.pop(src, None)
+            done.append(month)
+        return done
+
+    def drop_before(self, day: str) -> int:
+        """Delete whole months that end before day and trim the one it falls in."""
+        dropped = 0
+        for month in self.overlapping(end=day):
+            seg = self.segments()[month]
+            index = self._segment_index(month)
+            if seg["end"] >= day:
+                dropped += io.compact_daily_logs(index, drop_before=day)[1]
+                continue
+            path = os.path.join(self.directory, seg["file"])
+            with io.file_lock(path), io.file_lock(self.index_path):
+                index.refresh()
+                dropped += len(index.records)
+                data = io.load_json(self.index_path, {"segments": {}})
+                data["segments"].pop(month, None)
+                io.save_json(self.index_path, data)
+                if os.path.exists(path):
+                    os.remove(path)
+            io._log_indexes.pop(path, None)
+        return dropped
+
+    def changes_since(self, token: Dict[str, list] | None) -> tuple[List[str] | None, Dict[str, list]]:
+        """Per-segment journal_changes; a segment archived or removed since token is a rewrite."""
+        days: List[str] | None = []
+        new = {}
+        segments = self.segments()
+        if token is not None and any(m not in segments for m in token):
+            days = None
+        for month, seg in segments.items():
+            prev = None if token is None else token.get(month, [seg["file"], [0, 0]])
+            if prev is not None and prev[0] != seg["file"]:
+                prev = None
+            seg_days, seg_token = io.journal_changes(os.path.join(self.directory, seg["file"]),
+                                                     None if prev is None else prev[1])
+            new[month] = [seg["file"], seg_token]
+            if seg_days is None or days is None:
+                days = None
+            else:
+                days.extend(seg_days)
+        return (None if token is None else days), new
+
+    def compact(self) -> tuple[int, int]:
+        kept = dropped = 0
+        for month in self.segments():
+            k, d = io.compact_daily_logs(self._segment_index(month))
+            kept, dropped = kept + k, dropped + d
+        return kept, dropped
+
+_stores: Dict[str, SegmentedLogStore] = {}
+
+def segment_store(user: str | None = None) -> SegmentedLogStore:
+    d = segment_dir(user)
+    if d not in _stores:
+        _stores[d] = SegmentedLogStore(d)
+    return _stores[d]
+
+class SegmentedStorage(io.FileStorage):
+    """File backend with monthly log segments; processed tables stay CSV + snapshot."""
+
+    def upsert_logs(self, entries: List[Dict[str, Any]]):
+        segment_store(self.user).upsert(encode_app_usage(entries))
+
+    def compact_logs(self) -> tuple[int, int]:
+        return segment_store(self.user).compact()
+
+    def drop_logs_before(self, day: str) -> int:
+        return segment_store(self.user).drop_before(day)
+
+    def changes_since(self, token: Any) -> tuple[List[str] | None, Any]:
+        return segment_store(self.user).changes_since(token)
+
+    def read_days(self, days: List[str]) -> pd.DataFrame:
+        store = segment_store(self.user)
+        segments = store.segments()
+        records = []
+        for day in days:
+            if day[:7] in segments:
+                index = store._segment_index(day[:7])
+                with index._lock:
+                    index.refresh()
+                    if day in index.records:
+                        records.append(index.records[day])
+        return pd.DataFrame.from_records(records)
+
+def migrate_to_segments(user: str | None = None) -> int:
+    """Move the journal (and any legacy array) into monthly segments."""
+    index = io.daily_log_index(user=user)
+    # Appends wait on the journal lock, so none lands between the copy and the rename;
+    # later ones start a fresh journal, which daily_logs_df prefers over the segments
+    with io.file_lock(index.journal):
+        entries = index.values()
+        segment_store(user).upsert(entries)
+        for path in (index.journal, index.legacy):
+            if os.path.exists(path):
+                os.replace(path, path + ".migrated")
+    return len(entries)
@@ -0,0 +1,317 @@
+# utils/sqlite_store.py
+from __future__ import annotations
+import os, sqlite3
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+import pandas as pd
+from utils.app_dict import encode_app_usage
+from utils.child_tables import APP_USAGE_COLUMNS, RECITATIONS_COLUMNS, child_rows
+from utils.io_utils import (
+    COMPACT_JSON, DEFAULT_BATCH_DAYS, Storage, _StreamDigest, frame_digest, log_date_key
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    date TEXT NOT NULL,
+    entry TEXT NOT NULL
+);
+"""
+
+# One record per user and day; the unique index is what makes upserts replace in place
+UNIQUE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS ux_daily_logs_user_date ON daily_logs(user, date)"
+
+UPSERT_LOG = """
+INSERT INTO daily_logs(user, date, entry, seq) VALUES (?, ?, ?, ?)
+ON CONFLICT(user, date) DO UPDATE SET entry = excluded.entry, seq = excluded.seq
+"""
+
+# Every upsert batch stamps its rows with the next sequence number (change feed)
+SEQ_COLUMN = "ALTER TABLE daily_logs ADD COLUMN seq INTEGER NOT NULL DEFAULT 0"
+SEQ_INDEX = "CREATE INDEX IF NOT EXISTS ix_daily_logs_user_seq ON daily_logs(user, seq)"
+
+# Digest of the frame last written to each processed table, to skip identical rewrites
+TABLE_DIGESTS = """
+CREATE TABLE IF NOT EXISTS table_digests (
+    user TEXT NOT NULL,
+    name TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (user, name)
+)
+"""
+
+# Flat child rows of each day's record, replaced together with it
+CHILD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recitations (
+    user TEXT NOT NULL,
+    date TEXT NOT NULL,
+    surah_id INTEGER NOT NULL,
+    ayahs INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_recitations_user_date ON recitations(user, date);
+CREATE TABLE IF NOT EXISTS app_usage (
+    user TEXT NOT NULL,
+    date TEXT NOT NULL,
+    app_id INTEGER NOT NULL,
+    minutes REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_app_usage_user_date ON app_usage(user, date);
+"""
+
+DEDUPE_LOGS = """
+DELETE FROM daily_logs WHERE id NOT IN (
+    SELECT MAX(id) FROM daily_logs GROUP BY user, date
+)
+"""
+
+class SQLiteStorage(Storage):
+    """Raw logs and processed tables in one SQLite file (WAL), indexed on (user, date)."""
+
+    stores_children = True
+
+    def __init__(self, path: str, user: str = "default"):
+        self.path = path
+        self.user = user
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+            con.execute(TABLE_DIGESTS)
+            self._ensure_unique_dates(con)
+            if "seq" not in self._columns(con, "daily_logs"):
+                con.execute(SEQ_COLUMN)
+            con.execute(SEQ_INDEX)
+            self._ensure_child_tables(con)
+
+    @property
+    def location(self) -> str:
+        return self.path
+
+    def failed_logs_path(self) -> str:
+        # Next to the database, per user (one file can hold several users' rows)
+        return f"{os.path.splitext(self.path)[0]}.{self.user}.failed_logs.jsonl"
+
+    @contextmanager
+    def _connect(self):
+        # Short-lived connections keep this safe across Streamlit's script threads
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            con.execute("PRAGMA synchronous=NORMAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def _range_sql(start: str | None, end: str | None) -> tuple[str, List[Any]]:
+        sql, params = "", []
+        if start is not None:
+            sql += " AND date >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND date <= ?"
+            params.append(end)
+        return sql, params
+
+    # --- raw logs ---
+
+    def _ensure_unique_dates(self, con: sqlite3.Connection) -> int:
+        # Databases created before upserts may hold several rows per day: keep the latest
+        names = {r[1] for r in con.execute("PRAGMA index_list(daily_logs)")}
+        if "ux_daily_logs_user_date" in names:
+            return 0
+        dropped = con.execute(DEDUPE_LOGS).rowcount
+        con.execute("DROP INDEX IF EXISTS ix_daily_logs_user_date")
+        con.execute(UNIQUE_INDEX)
+        return dropped
+
+    @staticmethod
+    def _log_row(user: str, entry: Dict[str, Any], seq: int) -> tuple:
+        return (user, log_date_key(entry), COMPACT_JSON.encode(entry).decode("utf-8"), seq)
+
+    def _ensure_child_tables(self, con: sqlite3.Connection) -> None:
+        # Databases from before the child tables existed get them filled from daily_logs
+        existing = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        con.executescript(CHILD_SCHEMA)
+        if "recitations" in existing:
+            return
+        by_user: Dict[str, List[Dict[str, Any]]] = {}
+        for user, entry in con.execute("SELECT user, entry FROM daily_logs"):
+            by_user.setdefault(user, []).append(COMPACT_JSON.decode(entry))
+        for user, entries in by_user.items():
+            self._insert_children(con, user, encode_app_usage(entries))
+
+    @staticmethod
+    def _insert_children(con: sqlite3.Connection, user: str, entries: List[Dict[str, Any]]) -> None:
+        recs, usage = child_rows(entries, log_date_key)
+        con.executemany("INSERT INTO recitations VALUES (?, ?, ?, ?)", [(user, *r) for r in recs])
+        con.executemany("INSERT INTO app_usage VALUES (?, ?, ?, ?)", [(user, *u) for u in usage])
+
+    def upsert_logs(self, entries: List[Dict[str, Any]]):
+        # One entry per day (last wins), or the day's child rows would be inserted twice
+        entries = encode_app_usage(list({log_date_key(e): e for e in entries}.values()))
+        days = [(self.user, log_date_key(e)) for e in entries]
+        with self._connect() as con:
+            # Taking the write lock first keeps sequence numbers in commit order
+            con.execute("BEGIN IMMEDIATE")
+            seq = con.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM daily_logs").fetchone()[0]
+            con.executemany(UPSERT_LOG, [self._log_row(self.user, e, seq) for e in entries])
+            # A re-saved day replaces its child rows as well
+            con.executemany("DELETE FROM recitations WHERE user = ? AND date = ?", days)
+            con.executemany("DELETE FROM app_usage WHERE user = ? AND date = ?", days)
+            self._insert_children(con, self.user, entries)
+
+    def read_logs(self, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        rng, params = self._range_sql(start, end)
+        with self._connect() as con:
+            rows = con.execute(
+                f"SELECT entry FROM daily_logs WHERE user = ?{rng} ORDER BY date",
+                [self.user, *params],
+            ).fetchall()
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame.from_records(COMPACT_JSON.decode(r[0]) for r in rows)
+
+    def iter_logs(self, start: str | None = None, end: str | None = None,
+                  batch_days: int = DEFAULT_BATCH_DAYS) -> Iterator[pd.DataFrame]:
+        # Keyset pagination on (user, date): each batch is one indexed range query
+        after = None
+        while True:
+            rng, params = self._range_sql(start, end)
+            if after is not None:
+                rng += " AND date > ?"
+                params.append(after)
+            with self._connect() as con:
+                rows = con.execute(
+                    f"SELECT date, entry FROM daily_logs WHERE user = ?{rng} ORDER BY date LIMIT ?",
+                    [self.user, *params, batch_days],
+                ).fetchall()
+            if not rows:
+                return
+            after = rows[-1][0]
+            batch_days = (yield pd.DataFrame.from_records(COMPACT_JSON.decode(r[1]) for r in rows)) or batch_days
+
+    def read_children(self, start: str | None = None, end: str | None = None,
+                      logs: pd.DataFrame | None = None) -> Dict[str, pd.DataFrame]:
+        rng, params = self._range_sql(start, end)
+        out = {}
+        with self._connect() as con:
+            for name, columns in (("recitations", RECITATIONS_COLUMNS), ("app_usage", APP_USAGE_COLUMNS)):
+                df = pd.read_sql_query(
+                    f'SELECT {", ".join(columns)} FROM {name} WHERE user = ?{rng} ORDER BY date',
+                    con, params=[self.user, *params],
+                )
+                out[name] = df.astype(columns)
+        return out
+
+    # --- processed tables ---
+
+    def _columns(self, con: sqlite3.Connection, name: str) -> List[str]:
+        return [r[1] for r in con.execute(f'PRAGMA table_info("{name}")')]
+
+    def write_table(self, name: str, df: pd.DataFrame, appended: int = 0):
+        digest = frame_digest(df)
+        out = df.copy()
+        out.insert(0, "user", self.user)
+        with self._connect() as con:
+            row = con.execute("SELECT digest FROM table_digests WHERE user = ? AND name = ?",
+                              (self.user, name)).fetchone()
+            existing = self._columns(con, name)
+            if row is not None and row[0] == digest and existing:
+                return
+            if (row is not None and existing and set(out.columns) <= set(existing)
+                    and 0 < appended < len(df) and row[0] == frame_digest(df.iloc[:-appended])):
+                # Only new trailing rows: insert them instead of replacing the table
+                out.iloc[-appended:].to_sql(name, con, index=False, if_exists="append")
+                con.execute("UPDATE table_digests SET digest = ? WHERE user = ? AND name = ?",
+                            (digest, self.user, name))
+                return
+            self._prepare_table(con, name, out, existing)
+            # Each write replaces the user's previous snapshot of the table
+            con.execute(f'DELETE FROM "{name}" WHERE user = ?', (self.user,))
+            out.to_sql(name, con, index=False, if_exists="append")
+            con.execute("INSERT OR REPLACE INTO table_digests(user, name, digest) VALUES (?, ?, ?)",
+                        (self.user, name, digest))
+
+    @staticmethod
+    def _prepare_table(con: sqlite3.Connection, name: str, out: pd.DataFrame, existing: List[str]) -> None:
+        # Create the table on first write; later frames may bring new columns
+        if not existing:
+            out.head(0).to_sql(name, con, index=False)
+            con.execute(f'CREATE INDEX IF NOT EXISTS "ix_{name}_user_date" ON "{name}"(user, date)')
+        else:
+            for col in out.columns:
+                if col not in existing:
+                    con.execute(f'ALTER TABLE "{name}" ADD COLUMN "{col}"')
+
+    @contextmanager
+    def table_writer(self, name: str) -> Iterator[Callable[[pd.DataFrame], None]]:
+        # One transaction for the whole stream: readers see the old table until it commits
+        digest = _StreamDigest()
+        started = False
+        with self._connect() as con:
+            def write(chunk: pd.DataFrame):
+                nonlocal started
+                out = chunk.copy()
+                out.insert(0, "user", self.user)
+                self._prepare_table(con, name, out, self._columns(con, name))
+                if not started:
+                    con.execute(f'DELETE FROM "{name}" WHERE user = ?', (self.user,))
+                    started = True
+                out.to_sql(name, con, index=False, if_exists="append")
+                digest.update(chunk)
+
+            yield write
+            if not started:
+                return
+            if digest.hexdigest() is not None:
+                con.execute("INSERT OR REPLACE INTO table_digests(user, name, digest) VALUES (?, ?, ?)",
+                            (self.user, name, digest.hexdigest()))
+            else:
+                con.execute("DELETE FROM table_digests WHERE user = ? AND name = ?", (self.user, name))
+
+    def read_table(self, name: str, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        rng, params = self._range_sql(start, end)
+        with self._connect() as con:
+            if not self._columns(con, name):
+                return pd.DataFrame()
+            df = pd.read_sql_query(
+                f'SELECT * FROM "{name}" WHERE user = ?{rng} ORDER BY date',
+                con, params=[self.user, *params],
+            )
+        return df.drop(columns=["user"])
+
+    def changes_since(self, token: Any) -> tuple[List[str] | None, Any]:
+        with self._connect() as con:
+            seq = con.execute("SELECT COALESCE(MAX(seq), 0) FROM daily_logs").fetchone()[0]
+            if token is None:
+                return None, seq
+            days = [r[0] for r in con.execute(
+                "SELECT date FROM daily_logs WHERE user = ? AND seq > ?", (self.user, token))]
+        return days, seq
+
+    def log_fingerprint(self) -> Any:
+        # seq covers saves; the row count covers deletions (retention)
+        with self._connect() as con:
+            return list(con.execute(
+                "SELECT (SELECT COALESCE(MAX(seq), 0) FROM daily_logs), COUNT(*) FROM daily_logs WHERE user = ?",
+                (self.user,)).fetchone())
+
+    def drop_logs_before(self, day: str) -> int:
+        with self._connect() as con:
+            for child in ("recitations", "app_usage"):
+                con.execute(f"DELETE FROM {child} WHERE user = ? AND date < ?", (self.user, day))
+            return con.execute("DELETE FROM daily_logs WHERE user = ? AND date < ?",
+                               (self.user, day)).rowcount
+
+    def compact_logs(self) -> tuple[int, int]:
+        with self._connect() as con:
+            dropped = self._ensure_unique_dates(con)
+            kept = con.execute("SELECT COUNT(*) FROM daily_logs WHERE user = ?", (self.user,)).fetchone()[0]
+        con = sqlite3.connect(self.path)
+        try:
+            con.execute("VACUUM")
+        finally:
+            con.close()
+        return kept, dropped
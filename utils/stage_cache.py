@@ -0,0 +1,111 @@
+# utils/stage_cache.py
+from __future__ import annotations
+import os, pickle, threading, time
+from typing import Any, Dict
+import utils.io_utils as io
+
+# On-disk, content-addressed store for pipeline stage outputs: one pickle per
+# key under data/cache/, named by the key. A key hashes everything its output
+# depends on, so an entry is never stale; it just stops being asked for. Once
+# the directory grows past max_bytes the least recently used entries go.
+
+DEFAULT_CACHE_MB = 64
+
+def cache_dir(user: str | None = None) -> str:
+    return os.path.join(io.user_root(user), "data", "cache")
+
+def _load(path: str) -> Any:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+class ArtifactCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # Parsed entries stay in io.FILE_CACHE between reruns: treat them as read-only
+        path = self._path(key)
+        try:
+            value = io.FILE_CACHE.get(("artifact", path), [path], lambda: _load(path),
+                                      lambda v: os.path.getsize(path))
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return default
+        except Exception:
+            # Truncated, or pickled by code that has since changed (renamed classes,
+            # other pandas): a miss, and the entry goes so the stage rewrites it
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self._lock:
+                self.misses += 1
+            return default
+        # Recency is the access time; the modification time is the FILE_CACHE stamp
+        try:
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp = io.temp_path(path)
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        # The next get() is usually in this process: serve it without unpickling.
+        # value is shared from here on, so the caller must not modify it either
+        io.FILE_CACHE.get(("artifact", path), [path], lambda: value, lambda v: os.path.getsize(path))
+        self._evict(keep=path)
+
+    def _evict(self, keep: str):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_atime_ns, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+_caches: Dict[str, ArtifactCache] = {}
+
+def artifact_cache(user: str | None = None, max_bytes: int | None = None) -> ArtifactCache:
+    d = cache_dir(user)
+    if d not in _caches:
+        _caches[d] = ArtifactCache(d, DEFAULT_CACHE_MB * 2**20 if max_bytes is None else max_bytes)
+    elif max_bytes is not None:
+        _caches[d].max_bytes = max_bytes
+    return _caches[d]